@@ -1,21 +1,78 @@
 #!/usr/bin/env python3
-import gi, os, sys, pathlib, subprocess, threading
+import os, sys, time, hashlib, pathlib, threading, collections
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# playV.py --batch: 不載入 Gtk, 可在沒有 display 的機器上跑
+if __name__ == "__main__" and "--batch" in sys.argv[1:]:
+    from playV_batch import main
+    sys.exit(main([a for a in sys.argv[1:] if a != "--batch"]))
+
+from playV_core import (
+    DSRC_DIR, SSRC_DIR, SRES_DIR, GOLDEN_DIR, CACHE_DIR, DEFAULT_JOBS, READ_WORKERS, KILLED_STATUSES, GOLDEN_CHECK, FAIL_FAST,
+    SCHEDULE, STOP_AFTER, NOT_STARTED, Runner, Throttle, schedule_problems, counts_as_failure,
+    labs_roots_from_env, read_result, list_dirs, iter_discover, discover, iter_problems, read_all_results, format_output_block,
+    load_status_cache, save_status_cache, simulate_problem, reset_problem, format_divergence,
+    load_history, last_durations, summarize_history, format_duration,
+)
+
+from playV_vcd import VCDIndex, compare_vcd, format_report
+from playV_artifacts import artifact_cache
+from playV_scratch import scratch_from_env, wave_exists, local_wave
+from playV_dist import dist_from_env
+from playV_sync import sync_labs, format_sync_stats
+from playV_monitor import MONITOR, LatencyMonitor
+from playV_speculate import speculator_from_env
+
+import gi
 
 # GTK Initialization
 gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk, GLib, Gdk
+from gi.repository import Gtk, GLib, Gdk, Gio, GObject
 
 STATUS_COL = 2
+TIME_COL = 3
+STUDENT_COL = 4
 COLOR_MAP = {
     "NULL": "#cccccc",
     "PASS": "#a8f0a8",
     "FAIL": "#f0a8a8",
+    "TIMEOUT": "#f0d08a",
+    "CANCELLED": "#d0c0f0",
+    "RESOURCE": "#f0a8e0",
+    "QUEUED": "#e8e8e8",
+    "RUNNING": "#a8d0f0",
 }
-
-DSRC_DIR = "design_src"
-SSRC_DIR = "sim_src"
-SRES_DIR = "sim_result"
-GOLDEN_DIR = "golden"
+# Simulation All 進行中的暫時狀態, 不寫進 status cache
+TRANSIENT_STATUSES = ("QUEUED", "RUNNING")
+
+# terminal 保留行數, 超過的部分寫到 LOG_DIR
+SCROLLBACK_LINES = int(os.environ.get("PLAYV_SCROLLBACK", "20000"))
+SIM_BUFFER_LINES = 5000
+LOG_DIR = CACHE_DIR / "logs"
+
+# Compare Waves 最多列出幾個不一致就停
+COMPARE_MAX = int(os.environ.get("PLAYV_COMPARE_MAX", "20"))
+
+# 超過這個大小的 VCD 開 gtkwave 時只切第一個不一致附近的一段
+SLICE_BYTES = int(float(os.environ.get("PLAYV_SLICE_MB", "64")) * 1024 * 1024)
+SLICE_DIR = CACHE_DIR / "slices"
+
+# score board 即時更新: auto (Gio/inotify, 不行就 poll) | poll | off
+WATCH_MODE = os.environ.get("PLAYV_WATCH", "auto")
+POLL_SECONDS = 3
+
+# PLAYV_MONITOR=1: 統計 main loop 上每個 callback 的排隊與執行時間, 結束時寫到 LOG_DIR
+# 要在建任何 widget / timer 之前裝好
+monitor = None
+if MONITOR:
+    monitor = LatencyMonitor(LOG_DIR / f"monitor-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.json")
+    monitor.install(GLib, GObject, Gtk)
+
+# 狀態更新累積起來每隔這麼久才寫進 store 一次 (每次 set 都會讓 filter / sort 重算)
+STATUS_BATCH_MS = 100
+# Reset Every Design 對話框的自訂 response
+SYNC_LAB, SYNC_PROBLEM = 1, 2
+STATUS_FILTERS = ("all", "not PASS", "FAIL", "PASS", "NULL", "TIMEOUT", "RESOURCE", "CANCELLED", "RUNNING", "QUEUED")
 
 class TeeStream:
     def __init__(self, gui_callback, orig_stream, sync_filter_func):
@@ -30,84 +87,348 @@ class TeeStream:
         self.buffer += data
         while "\n" in self.buffer:
             line, self.buffer = self.buffer.split("\n", 1)
-            GLib.idle_add(self.sync_filter_func, line + "\n")
+            self.sync_filter_func(line + "\n")
 
     def flush(self):
         self.orig_stream.flush()
 
+class SpillFile:
+    # 每次執行一個 log 檔 (LOG_DIR 底下), 第一次寫入時才建立
+    def __init__(self, tag):
+        self.path = LOG_DIR / f"{tag}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.log"
+        self.f = None
+        self.lines = 0
+        self.failed = False
+
+    def write(self, text):
+        if self.failed:
+            return
+        try:
+            if self.f is None:
+                LOG_DIR.mkdir(parents=True, exist_ok=True)
+                self.f = open(self.path, "a")
+            self.f.write(text)
+            self.lines += text.count("\n")
+        except OSError as e:
+            self.failed = True
+            sys.__stderr__.write(f"[Warning] Failed to write {self.path}: {e}\n")
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+class LineRing:
+    # 只留最後 max_lines 行, 更早的寫進 SpillFile
+    def __init__(self, max_lines, spill):
+        self.max_lines = max_lines
+        self.spill = spill
+        self.lines = collections.deque()
+
+    def append(self, line):
+        self.lines.append(line)
+        if len(self.lines) > self.max_lines:
+            self.spill.write(self.lines.popleft())
+
+    def text(self):
+        body = "".join(self.lines)
+        if self.spill.lines:
+            return f"[playV] {self.spill.lines} earlier line(s) saved to {self.spill.path}\n" + body
+        return body
+
+    def close(self):
+        self.spill.close()
+
+class OutputPump:
+    # terminal 輸出的 queue: 任何 thread 都可 put, main loop 每 interval_ms 整批過濾後交給 sink
+    # 超過 max_pending 行時丟掉最舊的
+    def __init__(self, filter_func, sink, interval_ms=33, max_pending=200000):
+        self.filter_func = filter_func
+        self.sink = sink
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.pending = collections.deque()
+        self.lines = 0
+        self.frames = 0
+        self.dropped = 0
+        GLib.timeout_add(interval_ms, self.drain)
+
+    def put(self, text, raw=False, tag=None):
+        # raw=True: 已整理好的文字, 不經過 filter_func; tag: terminal 的 TextTag 名稱
+        with self.lock:
+            if len(self.pending) >= self.max_pending:
+                self.pending.popleft()
+                self.dropped += 1
+            self.pending.append((raw, text, tag))
+
+    def drain(self):
+        with self.lock:
+            if not self.pending:
+                return True
+            items, self.pending = self.pending, collections.deque()
+        segments = []
+        for raw, text, tag in items:
+            shown = text if raw else self.filter_func(text)
+            if not shown:
+                continue
+            if segments and segments[-1][0] == tag:
+                segments[-1][1].append(shown)
+            else:
+                segments.append((tag, [shown]))
+        self.lines += len(items)
+        self.frames += 1
+        for tag, chunks in segments:
+            self.sink("".join(chunks), tag)
+        return True
+
+    def take_stats(self):
+        with self.lock:
+            stats = (self.lines, self.frames, self.dropped)
+            self.lines = self.frames = self.dropped = 0
+        return stats
+
+class StatusWatcher:
+    # labs_root, 各 lab 目錄與每題 result.txt 有變動就更新 score board
+    # Gio file monitor (inotify), 不能用時改成背景 thread 每 POLL_SECONDS stat 一次
+    def __init__(self, app, mode=WATCH_MODE):
+        self.app = app
+        self.use_gio = mode != "poll"
+        self.monitors = {}
+        self.targets = []
+        self.pending = set()
+        self.flush_id = None
+        self.reading = False
+        self.poller = None
+        self.sync()
+
+    def _collect_targets(self):
+        targets = [(self.app.labs_root, ("root", None))]
+        for lab in self.app.subdirs:
+            targets.append((lab, ("lab", lab)))
+            for prob in self.app.child_map.get(lab) or [None]:
+                dirpath = prob or lab
+                key = (lab.name, prob.name if prob else "")
+                targets.append((dirpath / SRES_DIR / "result.txt", ("result", key)))
+        return targets
+
+    def sync(self):
+        # 目錄結構變動後呼叫, 只增減有變的 monitor
+        self.targets = self._collect_targets()
+        if self.use_gio:
+            try:
+                self._sync_monitors()
+                return
+            except Exception as e:
+                print(f"[Warning] File monitor unavailable, polling instead: {e}", file=sys.stderr)
+                self.use_gio = False
+                for mon in self.monitors.values():
+                    mon.cancel()
+                self.monitors.clear()
+        if self.poller is None:
+            self.poller = threading.Thread(target=self._poll_loop, daemon=True)
+            self.poller.start()
+
+    def _sync_monitors(self):
+        wanted = dict(self.targets)
+        for path in list(self.monitors):
+            if path not in wanted:
+                self.monitors.pop(path).cancel()
+        for path, event in wanted.items():
+            if path in self.monitors:
+                continue
+            gfile = Gio.File.new_for_path(str(path))
+            if event[0] == "result":
+                mon = gfile.monitor_file(Gio.FileMonitorFlags.NONE, None)
+            else:
+                mon = gfile.monitor_directory(Gio.FileMonitorFlags.NONE, None)
+            mon.connect("changed", self._on_changed, event)
+            self.monitors[path] = mon
+
+    def _on_changed(self, monitor, gfile, other, event_type, event):
+        if event[0] != "result" and event_type not in (Gio.FileMonitorEvent.CREATED, Gio.FileMonitorEvent.DELETED):
+            return
+        self.queue(event)
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            st = path.stat()
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _poll_loop(self):
+        # 只有 stat(), 在背景 thread 跑, 目錄變動看 mtime
+        stamps = {}
+        while True:
+            for path, event in list(self.targets):
+                stamp = self._stamp(path)
+                if path in stamps and stamps[path] != stamp:
+                    GLib.idle_add(self.queue, event)
+                stamps[path] = stamp
+            time.sleep(POLL_SECONDS)
+
+    def queue(self, event):
+        self.pending.add(event)
+        if self.flush_id is None and not self.reading:
+            self.flush_id = GLib.timeout_add(200, self._flush)
+        return False
+
+    def _flush(self):
+        # 目錄與 result.txt 在背景 thread 讀 (NFS), main thread 只更新 store
+        self.flush_id = None
+        events, self.pending = self.pending, set()
+        board = self.app.board
+        self.reading = True
+        threading.Thread(target=self._read, args=(board, events, board.subdirs, board.child_map), daemon=True).start()
+        return False
+
+    @staticmethod
+    def _children(lab):
+        try:
+            return list_dirs(lab)
+        except OSError:
+            return []
+
+    def _read(self, board, events, old_subdirs, old_child_map):
+        # worker thread: 回傳新的 (subdirs, child_map) 與要更新的狀態; 結構沒變時 subdirs 為 None
+        subdirs, child_map = old_subdirs, dict(old_child_map)
+        structure = False
+        if ("root", None) in events:
+            try:
+                labs = list_dirs(board.labs_root)
+            except OSError as e:
+                print(f"[Warning] Failed to read {board.labs_root}: {e}", file=sys.stderr)
+                labs = subdirs
+            if labs != subdirs:
+                structure = True
+                child_map = {lab: child_map[lab] if lab in child_map else self._children(lab) for lab in labs}
+                subdirs = labs
+        for kind, lab in events:
+            if kind != "lab" or lab not in child_map:
+                continue
+            try:
+                children = list_dirs(lab)
+            except OSError:
+                continue
+            if children != child_map[lab]:
+                child_map[lab] = children
+                structure = True
+        # 新出現的題目與 result.txt 有變的題目才讀
+        known = {(lab, prob) for lab, prob, _ in iter_problems(old_subdirs, old_child_map)}
+        statuses = {}
+        for lab, prob, dirpath in iter_problems(subdirs, child_map):
+            if (lab, prob) not in known or ("result", (lab, prob)) in events:
+                statuses[(lab, prob)] = read_result(dirpath, missing="NULL")
+        GLib.idle_add(self._apply, board, events, (old_subdirs, old_child_map),
+                      (subdirs, child_map) if structure else None, statuses)
+
+    def _apply(self, board, events, old, structure, statuses):
+        self.reading = False
+        if board is self.app.board:
+            if structure and (board.subdirs is not old[0] or board.child_map is not old[1]):
+                # 讀的期間結構被別人換掉了 (Refresh Status 等), 目錄變動重讀一次
+                self.pending |= {e for e in events if e[0] != "result"}
+                structure = None
+            if structure:
+                self.app._apply_structure(*structure, statuses)
+                self.sync()
+            for (lab, prob), status in statuses.items():
+                self.app._update_status(lab, prob, status)
+        if self.pending and self.flush_id is None:
+            self.flush_id = GLib.timeout_add(200, self._flush)
+        return False
+
+class Board:
+    # 一個 labs root (一個學生); 所有 Board 的 row 都在同一個 store, 以 STUDENT_COL 區分
+    def __init__(self, student, labs_root):
+        self.student = student
+        self.labs_root = labs_root
+        self.subdirs = []
+        self.child_map = {}
+        self.row_map = {}
+        self.result_mtimes = {}
+        self.durations = {}
+
+def _board_attr(name):
+    # playV 的這些欄位都是目前選到的 Board 的
+    return property(lambda self: getattr(self.board, name), lambda self, value: setattr(self.board, name, value))
+
 class playV(Gtk.Application):
+    labs_root = _board_attr("labs_root")
+    subdirs = _board_attr("subdirs")
+    child_map = _board_attr("child_map")
+    row_map = _board_attr("row_map")
+    result_mtimes = _board_attr("result_mtimes")
+    durations = _board_attr("durations")
+
     def __init__(self):
         super().__init__(application_id="tw.nycu.playv.v3_0")
-        root = os.environ.get("LABSROOT")
-        if not root:
-            root = "/home/verilog/Desktop/dlab/public/labs/"
-            # raise SystemExit("❌ Please set LABSROOT")
-        self.labs_root = pathlib.Path(root).expanduser()
-        if not self.labs_root.is_dir():
-            raise SystemExit(f"LABSROOT is not a directory: {self.labs_root}")
+        # PLAYV_ROOTS 可列出多個 labs root (每個學生一個), 沒設時只有 LABSROOT
+        self.boards = [Board(student, root) for student, root in labs_roots_from_env()]
+        for board in [b for b in self.boards if not b.labs_root.is_dir()]:
+            if len(self.boards) == 1:
+                raise SystemExit(f"LABSROOT is not a directory: {board.labs_root}")
+            print(f"[Warning] Skipping {board.student}: not a directory: {board.labs_root}", file=sys.stderr)
+            self.boards.remove(board)
+        if not self.boards:
+            raise SystemExit("None of the PLAYV_ROOTS is a directory")
+        self.board = self.boards[0]
+        self.board_by_student = {b.student: b for b in self.boards}
+        self.multi_root = len(self.boards) > 1
 
         # Initialize but defer content setting until do_activate
-        self.subdirs = []
-        self.child_map = {}
-        self.store = Gtk.ListStore(str, str, str)
-        self.row_map = {}
+        self.store = Gtk.ListStore(str, str, str, str, str)
+        self.filter_model = None
+        self.sort_model = None
+        self.status_filter = "all"
+        self.search_terms = []
+        self._pending_status = {}
+        self._status_flush_id = None
+        self._startup = False
+        self.first_mismatch = {}
+        self.watcher = None
         self._busy = False
         self._combo_ignore = False
         self.sync_output = False
         self.current_lab = None
         self.current_prob = None
         self.sim_running = False
-        self.sim_terminal_buffer = ""
+        self.sim_terminal_buffer = LineRing(SIM_BUFFER_LINES, SpillFile("sim"))
+        self.term_spill = SpillFile("terminal")
         self.sim_student_can_see = False
+        self.jobs = DEFAULT_JOBS
+        self.force_all = False
+        self.golden_check = GOLDEN_CHECK
+        self.fail_fast = FAIL_FAST
+        self.schedule = SCHEDULE
+        self.stop_after = STOP_AFTER
+        self._queued_prev = {}
+        self.artifacts = artifact_cache()
+        self.scratch = scratch_from_env()
+        self.coordinator = None
+        self.speculator = speculator_from_env(poll=WATCH_MODE == "poll")
+        self.spec_monitors = []
+        self.runner = Runner()
 
     def do_activate(self):
         print("✅ GUI starting...")
 
-        # Rebuild directory structure
-        self.subdirs = sorted(
-            [p for p in self.labs_root.iterdir() if p.is_dir() and not p.name.startswith('.')]
-        )
-
-        if not self.subdirs:
-            dialog = Gtk.MessageDialog(
-                message_type=Gtk.MessageType.ERROR,
-                buttons=Gtk.ButtonsType.CLOSE,
-                text="⚠️ No lab folders found in LABSROOT."
-            )
-            dialog.set_modal(True)
-            dialog.run()
-            dialog.destroy()
-            self.quit()
-            return
-
-        # Set child_map only for valid directories
-        self.child_map = {}
-        for lab in self.subdirs:
-            try:
-                children = [c for c in lab.iterdir() if c.is_dir() and not c.name.startswith('.')]
-                self.child_map[lab] = sorted(children)
-            except Exception as e:
-                print(f"[Warning] Failed to read subdirectories of {lab}: {e}", file=sys.stderr)
-                self.child_map[lab] = []
-
-        print(f"✅ LABSROOT: {self.labs_root}")
-        print(f"✅ labs: {[p.name for p in self.subdirs]}")
-
-        # Prevent proceeding if all subdirectories are also empty (e.g. lab1 has no content)
-        if all(len(children) == 0 for children in self.child_map.values()):
-            dialog = Gtk.MessageDialog(
-                message_type=Gtk.MessageType.ERROR,
-                buttons=Gtk.ButtonsType.CLOSE,
-                text="⚠️ No problems found in any lab folders."
-            )
-            dialog.set_modal(True)
-            dialog.run()
-            dialog.destroy()
-            self.quit()
-            return
+        # 有 status cache 就先用 cache 的結構與狀態; 沒有的話視窗先出來, 目錄在背景掃描
+        uncached = []
+        for board in self.boards:
+            cached = load_status_cache(board.labs_root)
+            if not cached:
+                uncached.append(board)
+                continue
+            board.subdirs, board.child_map, rows = cached
+            for lab, prob, status, mtime in rows:
+                board.row_map[(lab, prob)] = self.store.append([lab, prob, status, "", board.student])
+                board.result_mtimes[(lab, prob)] = mtime
+        for board in self.boards:
+            print(f"✅ LABSROOT: {board.labs_root}" + (f" ({board.student})" if self.multi_root else ""))
 
         # TODO: Connect to GUI setup logic (e.g., create main window, components, etc.)
-        print("✅ Directory scan and validation complete. Proceed to GUI setup.")
         win = Gtk.ApplicationWindow(application=self)
         win.set_wmclass("playV", "playV")
         win.set_title("playV v3.0")
@@ -159,39 +480,81 @@ class playV(Gtk.Application):
 
         self.btn_show_golden_log = Gtk.Button(label="Result (golden)")
         self.btn_wave_golden = Gtk.Button(label="Waveform (golden)")
+        self.btn_compare = Gtk.Button(label="Compare Waves")
 
         self.btn_show_golden_log.connect("clicked", self.show_golden_log)
         self.btn_wave_golden.connect("clicked", self.open_gtkwave_golden)
+        self.btn_compare.connect("clicked", self.compare_waves)
 
         hbox_golden.pack_start(self.btn_show_golden_log, True, True, 0)
         hbox_golden.pack_start(self.btn_wave_golden, True, True, 0)
+        hbox_golden.pack_start(self.btn_compare, True, True, 0)
 
-        self.all_buttons = [self.btn_code, self.btn_test, self.btn_wave, self.btn_show_golden_log, self.btn_wave_golden]
+        self.entry_lookup = Gtk.Entry()
+        self.entry_lookup.set_placeholder_text("signal @ time")
+        self.entry_lookup.set_tooltip_text("Look up a signal's value in both waveforms, e.g. cnt @ 150")
+        self.entry_lookup.connect("activate", self.lookup_wave_value)
+        main_box.pack_start(self.entry_lookup, False, False, 0)
 
-        tree = Gtk.TreeView(model=self.store)
+        self.all_buttons = [self.btn_code, self.btn_test, self.btn_wave, self.btn_show_golden_log, self.btn_wave_golden,
+                            self.btn_compare, self.entry_lookup]
+
+        tree = Gtk.TreeView()
         tree.set_headers_visible(True)
         tree.get_selection().set_mode(Gtk.SelectionMode.SINGLE)
         tree.connect("button-press-event", self.on_tree_click)
         renderer = Gtk.CellRendererText()
+        col_student = Gtk.TreeViewColumn("student", renderer, text=STUDENT_COL)
+        col_student.set_min_width(120)
+        col_student.set_sort_column_id(STUDENT_COL)
+        col_student.set_visible(self.multi_root)
+        tree.append_column(col_student)
         col_lab = Gtk.TreeViewColumn("lab", renderer, text=0)
         col_lab.set_min_width(150)
         col_lab.set_expand(True)
+        col_lab.set_sort_column_id(0)
         tree.append_column(col_lab)
         col_prob = Gtk.TreeViewColumn("problem", renderer, text=1)
         col_prob.set_min_width(150)
         col_prob.set_expand(True)
+        col_prob.set_sort_column_id(1)
         tree.append_column(col_prob)
         renderer_status = Gtk.CellRendererText()
         col_status = Gtk.TreeViewColumn("status", renderer_status, text=STATUS_COL)
         col_status.set_min_width(90)
         col_status.set_expand(True)
         col_status.set_cell_data_func(renderer_status, self._status_color_func)
+        col_status.set_sort_column_id(STATUS_COL)
         tree.append_column(col_status)
+        col_time = Gtk.TreeViewColumn("time", Gtk.CellRendererText(xalign=1.0), text=TIME_COL)
+        col_time.set_min_width(70)
+        col_time.set_sort_column_id(TIME_COL)
+        tree.append_column(col_time)
         tree.get_selection().connect("changed", self.on_tree_selected)
+        self.tree = tree
+        self._attach_store(self.store)
         scroller = Gtk.ScrolledWindow(vexpand=True)
         scroller.add(tree)
+
+        # 搜尋 / 狀態篩選, 只影響顯示 (TreeModelFilter), store 與 row_map 不變
+        filter_bar = Gtk.Box(spacing=6)
+        self.entry_search = Gtk.SearchEntry()
+        self.entry_search.set_placeholder_text("search student / lab / problem")
+        self.entry_search.connect("search-changed", self.on_filter_changed)
+        filter_bar.pack_start(self.entry_search, True, True, 0)
+        self.combo_status = Gtk.ComboBoxText()
+        for name in STATUS_FILTERS:
+            self.combo_status.append(name, name)
+        self.combo_status.set_active_id("all")
+        self.combo_status.connect("changed", self.on_filter_changed)
+        filter_bar.pack_start(self.combo_status, False, False, 0)
+        self.lbl_rows = Gtk.Label()
+        filter_bar.pack_start(self.lbl_rows, False, False, 0)
+        board_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        board_box.pack_start(filter_bar, False, False, 0)
+        board_box.pack_start(scroller, True, True, 0)
         frame = Gtk.Frame(label="score board")
-        frame.add(scroller)
+        frame.add(board_box)
         main_box.pack_start(frame, True, True, 0)
         hbox2 = Gtk.Box(spacing=10)
         main_box.pack_start(hbox2, False, False, 0)
@@ -205,11 +568,46 @@ class playV(Gtk.Application):
         self.btn_test_all = Gtk.Button(label="Simulation All")
         self.btn_test_all.connect("clicked", self.on_test_all_clicked)
         hbox2.pack_start(self.btn_test_all, True, True, 0)
-        self.all_buttons += [self.btn_reset_all, self.btn_test_all]
+        hbox2.pack_start(Gtk.Label(label="jobs"), False, False, 0)
+        self.spin_jobs = Gtk.SpinButton.new_with_range(1, max(64, self.jobs), 1)
+        self.spin_jobs.set_value(self.jobs)
+        self.spin_jobs.connect("value-changed", lambda w: setattr(self, "jobs", w.get_value_as_int()))
+        hbox2.pack_start(self.spin_jobs, False, False, 0)
+        self.chk_force = Gtk.CheckButton(label="force")
+        self.chk_force.set_tooltip_text("Rerun problems whose inputs have not changed instead of reusing earlier results")
+        self.chk_force.connect("toggled", lambda w: setattr(self, "force_all", w.get_active()))
+        hbox2.pack_start(self.chk_force, False, False, 0)
+        self.chk_golden = Gtk.CheckButton(label="check")
+        self.chk_golden.set_tooltip_text("Compare the output with golden_log.txt while it runs and mark the first difference")
+        self.chk_golden.set_active(self.golden_check)
+        self.chk_golden.connect("toggled", lambda w: setattr(self, "golden_check", w.get_active()))
+        hbox2.pack_start(self.chk_golden, False, False, 0)
+        self.chk_fail_fast = Gtk.CheckButton(label="fail-fast")
+        self.chk_fail_fast.set_tooltip_text("Stop a simulation at its first difference from golden_log.txt")
+        self.chk_fail_fast.set_active(self.fail_fast)
+        self.chk_fail_fast.connect("toggled", lambda w: setattr(self, "fail_fast", w.get_active()))
+        hbox2.pack_start(self.chk_fail_fast, False, False, 0)
+        self.chk_smart = Gtk.CheckButton(label="smart order")
+        self.chk_smart.set_tooltip_text("Run failing and recently edited problems first, the longest first when parallel")
+        self.chk_smart.set_active(self.schedule == "smart")
+        self.chk_smart.connect("toggled", lambda w: setattr(self, "schedule", "smart" if w.get_active() else "alpha"))
+        hbox2.pack_start(self.chk_smart, False, False, 0)
+        hbox2.pack_start(Gtk.Label(label="stop after"), False, False, 0)
+        self.spin_stop_after = Gtk.SpinButton.new_with_range(0, 999, 1)
+        self.spin_stop_after.set_tooltip_text("Cancel the remaining problems after this many failures (0: never)")
+        self.spin_stop_after.set_value(self.stop_after)
+        self.spin_stop_after.connect("value-changed", lambda w: setattr(self, "stop_after", w.get_value_as_int()))
+        hbox2.pack_start(self.spin_stop_after, False, False, 0)
+        self.btn_timing = Gtk.Button(label="Timing")
+        self.btn_timing.connect("clicked", self.show_timing_summary)
+        hbox2.pack_start(self.btn_timing, False, False, 0)
+        self.all_buttons += [self.btn_reset_all, self.btn_test_all, self.spin_jobs, self.chk_force, self.chk_golden,
+                             self.chk_fail_fast, self.chk_smart, self.spin_stop_after, self.btn_timing]
         self.refresh_child_options()
         self.switch_to_selected()
         self.tree = tree
         self.set_buttons_sensitive(False)
+        self.watcher = StatusWatcher(self) if WATCH_MODE != "off" else None
 
         term_frame = Gtk.Frame(label="Simulation Result")
         hpaned.add2(term_frame)
@@ -262,6 +660,9 @@ class playV(Gtk.Application):
         overlay_box.pack_start(self.sim_spinner, False, False, 0)
         self.sim_label = Gtk.Label(label="simulation...")
         overlay_box.pack_start(self.sim_label, False, False, 0)
+        self.btn_cancel = Gtk.Button(label="Cancel")
+        self.btn_cancel.connect("clicked", self.on_cancel_clicked)
+        overlay_box.pack_start(self.btn_cancel, False, False, 0)
 
         self.sim_mask = Gtk.EventBox()
         self.sim_mask.set_visible_window(True)
@@ -272,23 +673,71 @@ class playV(Gtk.Application):
 
         term_right_vbox.pack_start(self.term_overlay, True, True, 0)
 
+        self.term_end_mark = self.term_buffer.create_mark("term_end", self.term_buffer.get_end_iter(), False)
+        self.term_buffer.create_tag("diverge", background=COLOR_MAP["FAIL"], weight=700)
+        self.pump = OutputPump(self._filter_output, self.append_to_terminal)
+
         win.show_all()
         self.sim_mask.hide()
         hpaned.set_position(int(width * 1/3))
-        sys.stdout = TeeStream(self.gui_sync_output, sys.__stdout__, self.sync_filter)
-        sys.stderr = TeeStream(self.gui_sync_output, sys.__stderr__, self.sync_filter)
-
-    def append_to_terminal(self, text):
-        end_iter = self.term_buffer.get_end_iter()
-        self.term_buffer.insert(end_iter, text)
-        mark = self.term_buffer.create_mark(None, self.term_buffer.get_end_iter(), False)
-        self.term_view.scroll_to_mark(mark, 0.0, True, 0.0, 1.0)
+        sys.stdout = TeeStream(self.gui_sync_output, sys.__stdout__, self.pump.put)
+        sys.stderr = TeeStream(self.gui_sync_output, sys.__stderr__, self.pump.put)
+
+        # 背景重新確認 (cache 裡 mtime 沒變的 result.txt 不重讀); 沒有 cache 時 row 邊掃邊加
+        self._startup = True
+        known = {board: self._known_results(board) for board in self.boards}
+        threading.Thread(target=self._refresh_all_status, args=(known, False, uncached), daemon=True).start()
+
+    def do_shutdown(self):
+        self._flush_status()
+        for board in self.boards:
+            if board.subdirs:
+                save_status_cache(board.labs_root, board.subdirs, board.child_map, self._store_rows(board))
+        if self.coordinator:
+            self.coordinator.close()
+        if self.speculator:
+            self.speculator.close()
+        Gtk.Application.do_shutdown(self)
+
+    def _store_rows(self, board):
+        return [(lab, prob, self._settled_status(board, lab, prob, self.store[it][STATUS_COL]),
+                 board.result_mtimes.get((lab, prob)))
+                for (lab, prob), it in board.row_map.items()]
+
+    def _settled_status(self, board, lab, prob, status):
+        # QUEUED / RUNNING 換回排進 Simulation All 之前的狀態
+        if status in TRANSIENT_STATUSES:
+            return self._queued_prev.get((board, lab, prob), "NULL")
+        return status
+
+    def _known_results(self, board):
+        return {(lab, prob): (status, mtime) for lab, prob, status, mtime in self._store_rows(board) if mtime is not None}
+
+    def append_to_terminal(self, text, tag=None):
+        if tag:
+            self.term_buffer.insert_with_tags_by_name(self.term_buffer.get_end_iter(), text, tag)
+        else:
+            self.term_buffer.insert(self.term_buffer.get_end_iter(), text)
+        self._trim_scrollback()
+        self.term_buffer.move_mark(self.term_end_mark, self.term_buffer.get_end_iter())
+        self.term_view.scroll_to_mark(self.term_end_mark, 0.0, True, 0.0, 1.0)
         return False
 
-    def gui_sync_output(self, text):
+    def _trim_scrollback(self):
+        # 超過上限 10% 才一次砍掉最舊的部分, 避免每次 insert 都 delete
+        excess = self.term_buffer.get_line_count() - SCROLLBACK_LINES
+        if excess <= SCROLLBACK_LINES // 10:
+            return
+        start = self.term_buffer.get_start_iter()
+        cut = self.term_buffer.get_iter_at_line(excess)
+        self.term_spill.write(self.term_buffer.get_text(start, cut, False))
+        self.term_buffer.delete(start, cut)
+
+    def _filter_output(self, text):
+        # 回傳要顯示在 terminal 的文字, 不顯示則回傳 None
         # for simulation error dialog (v3.0)
         if getattr(self, "sim_running", False):
-            self.sim_terminal_buffer += text + "\n"
+            self.sim_terminal_buffer.append(text if text.endswith("\n") else text + "\n")
             if "##SEC_STUDENT_CAN_SEE" in text:
                 self.sim_student_can_see = True
 
@@ -297,26 +746,86 @@ class playV(Gtk.Application):
         if "##SEC_STUDENT_CAN_SEE" in text:
             self.sync_output = True
             prob_name = self.current_prob or "(unnamed)"
-            self.append_to_terminal(f"【{prob_name}】\n")
-            return False
+            return f"【{prob_name}】\n"
         elif "##END_STUDENT_CAN_SEE" in text:
             self.sync_output = False
-            return False
         elif self.sync_output:
-            self.append_to_terminal(text + "\n")
+            return text + "\n"
+        return None
+
+    def gui_sync_output(self, text):
+        shown = self._filter_output(text)
+        if shown:
+            self.append_to_terminal(shown)
         return False
 
-    def sync_filter(self, text):
-        return self.gui_sync_output(text)
+    def _report_output_stats(self):
+        lines, frames, dropped = self.pump.take_stats()
+        sys.__stdout__.write(f"[playV] terminal: {lines} line(s) in {frames} frame(s), {dropped} dropped\n")
+        if dropped:
+            self.append_to_terminal(f"[playV] {dropped} line(s) dropped under backpressure\n")
+        return False
 
     def _populate_store(self):
         for lab in self.subdirs:
             probs = self.child_map[lab] or [""]
             for prob in probs:
                 p_name = prob.name if isinstance(prob, pathlib.Path) else prob
-                it = self.store.append([lab.name, p_name, "NULL"])
+                it = self.store.append([lab.name, p_name, "NULL", "", self.board.student])
                 self.row_map[(lab.name, p_name)] = it
 
+    def _attach_store(self, store):
+        # store 外面包 filter (搜尋 / 狀態) 與 sort (點欄位標題) 再給 TreeView, 沿用原本的排序
+        sort_id, order = self.sort_model.get_sort_column_id() if self.sort_model else (None, None)
+        self.store = store
+        self.filter_model = store.filter_new()
+        self.filter_model.set_visible_func(self._row_visible)
+        self.sort_model = Gtk.TreeModelSort(model=self.filter_model)
+        self.sort_model.set_sort_func(TIME_COL, self._time_sort_func)
+        if sort_id is not None:
+            self.sort_model.set_sort_column_id(sort_id, order)
+        self.tree.set_model(self.sort_model)
+        self._update_row_count()
+
+    def _row_visible(self, model, it, _):
+        status = model.get_value(it, STATUS_COL)
+        if self.status_filter == "not PASS":
+            if status == "PASS":
+                return False
+        elif self.status_filter != "all" and status != self.status_filter:
+            return False
+        if self.search_terms:
+            text = f"{model.get_value(it, STUDENT_COL)}/{model.get_value(it, 0)}/{model.get_value(it, 1)}".lower()
+            return all(term in text for term in self.search_terms)
+        return True
+
+    def _time_sort_func(self, model, a, b, _):
+        # time 欄位依秒數排, 沒有紀錄的排最前面
+        def seconds(it):
+            board = self.board_by_student.get(model.get_value(it, STUDENT_COL))
+            value = board.durations.get((model.get_value(it, 0), model.get_value(it, 1))) if board else None
+            return -1.0 if value is None else value
+        x, y = seconds(a), seconds(b)
+        return (x > y) - (x < y)
+
+    def on_filter_changed(self, *_):
+        self.search_terms = self.entry_search.get_text().lower().split()
+        self.status_filter = self.combo_status.get_active_id() or "all"
+        self.filter_model.refilter()
+        self._update_row_count()
+
+    def _update_row_count(self):
+        if hasattr(self, "lbl_rows"):
+            self.lbl_rows.set_text(f"{self.filter_model.iter_n_children(None)} / {len(self.store)}")
+
+    def _activate_board(self, board):
+        # 選到別的學生的 row: 之後的 combo / cwd / Simulation 都以這個 root 為準
+        self.board = board
+        self._refresh_parent_options()
+        if self.watcher:
+            self.watcher.pending.clear()
+            self.watcher.sync()
+
     def _status_color_func(self, column, cell, model, it, _):
         status = model[it][STATUS_COL].upper()
         cell.set_property("cell-background", COLOR_MAP.get(status, "#ffffff"))
@@ -349,6 +858,9 @@ class playV(Gtk.Application):
             self.current_prob = None
             return
         lab, prob = model[it][0], model[it][1]
+        board = self.board_by_student.get(model[it][STUDENT_COL], self.board)
+        if board is not self.board:
+            self._activate_board(board)
         self.current_lab = lab
         self.current_prob = prob
         self._combo_ignore = True
@@ -375,6 +887,8 @@ class playV(Gtk.Application):
 
     def refresh_child_options(self):
         self.combo_child.remove_all()
+        if not self.subdirs or self.combo_parent.get_active() < 0:
+            return
         parent = self.subdirs[self.combo_parent.get_active()]
         for c in self.child_map[parent]:
             self.combo_child.append_text(c.name)
@@ -382,7 +896,7 @@ class playV(Gtk.Application):
             self.combo_child.set_active(0)
 
     def switch_to_selected(self):
-        if self._busy:
+        if self._busy or not self.subdirs or self.combo_parent.get_active() < 0:
             return
         lab  = self.subdirs[self.combo_parent.get_active()].name
         prob = self.combo_child.get_active_text() or ""
@@ -392,12 +906,32 @@ class playV(Gtk.Application):
             self.lbl_cwd.set_text(f"Current CWD: {target}")
         except Exception as e:
             print(f"[playV] 切換失敗: {e}", file=sys.stderr)
+        if self.speculator:
+            self._watch_speculation(target)
+
+    def _watch_speculation(self, target):
+        # design_src / sim_src 的 file monitor 通知 speculator; monitor 不能用時 speculator 自己 poll
+        for mon in self.spec_monitors:
+            mon.cancel()
+        self.spec_monitors = []
+        self.speculator.watch(target)
+        if self.speculator.polling:
+            return
+        try:
+            for sub in (DSRC_DIR, SSRC_DIR):
+                mon = Gio.File.new_for_path(str(target / sub)).monitor_directory(Gio.FileMonitorFlags.NONE, None)
+                mon.connect("changed", lambda *_: self.speculator.notify())
+                self.spec_monitors.append(mon)
+        except Exception as e:
+            print(f"[Warning] File monitor unavailable, polling {target} for background runs: {e}", file=sys.stderr)
+            self.speculator.start_polling()
 
     def run_make_async(self, target):
         if self._busy:
             return
         # -- v3.0 simulation mode tracking --
-        self.sim_terminal_buffer = ""
+        self.sim_terminal_buffer.close()
+        self.sim_terminal_buffer = LineRing(SIM_BUFFER_LINES, SpillFile("sim"))
         self.sim_student_can_see = False
         self.sim_running = ("test" in target)
         self.set_busy(True)
@@ -406,20 +940,46 @@ class playV(Gtk.Application):
     def _run_make(self, target):
         lab  = self.subdirs[self.combo_parent.get_active()].name
         prob = self.combo_child.get_active_text() or ""
+        killed = None
+        res = None
         try:
-            self._run_and_log(["make"] + target.split())
+            if target == "test":
+                self.first_mismatch.pop(str(pathlib.Path.cwd()), None)
+                # Simulation 一定真的跑 (artifact cache 只給 Simulation All 用)
+                res = simulate_problem(self.runner, pathlib.Path.cwd(), on_line=self._stream_line,
+                                       golden_check=self.golden_check, fail_fast=self.fail_fast,
+                                       on_diverge=self._report_divergence, scratch=self.scratch,
+                                       speculative=None if self.force_all else self.speculator)
+                if res["speculative"]:
+                    self.pump.put("[playV] output of the background run started when design_src was saved\n", raw=True)
+                if res["in_place"]:
+                    self.pump.put(f"[playV] ran in place: {res['in_place']}\n", raw=True)
+                if res["status"] in KILLED_STATUSES:
+                    killed = res["status"]
+                if res["detail"]:
+                    self._report_killed(res["detail"])
+            else:
+                _, killed = self._run_and_log(["make"] + target.split(), limits=True)
         finally:
-            if "test" in target:
-                status = self._read_status()
-                GLib.idle_add(self._update_status, lab, prob, status)
-                # v3.0: show dialog if never enter student can see mode
-                if not self.sim_student_can_see:
-                    buffer_copy = self.sim_terminal_buffer.strip()
-                    GLib.idle_add(self.show_sim_error_popup, buffer_copy)
+            if res:
+                GLib.idle_add(self._update_status, lab, prob, res["status"])
+                if not res["speculative"]:
+                    GLib.idle_add(self._update_time, lab, prob, res["duration"])
             elif "clean" in target:
-                GLib.idle_add(self._update_status, lab, prob, "NULL")
-            GLib.idle_add(self.set_busy, False)
-            self.sim_running = False
+                GLib.idle_add(self._update_status, lab, prob, killed or "NULL")
+            GLib.idle_add(self._finish_make, killed)
+
+    def _finish_make(self, killed=None):
+        # main thread: 先把 pump 裡剩下的輸出處理完, sim_terminal_buffer 才完整
+        self.pump.drain()
+        show_error = self.sim_running and not self.sim_student_can_see and not killed
+        self.sim_running = False
+        self._report_output_stats()
+        self.set_busy(False)
+        # v3.0: show dialog if never enter student can see mode
+        if show_error:
+            self.show_sim_error_popup(self.sim_terminal_buffer.text().strip())
+        return False
 
     def show_sim_error_popup(self, message):
         dialog = Gtk.Dialog(title="Error Message", parent=None, modal=True)
@@ -446,32 +1006,114 @@ class playV(Gtk.Application):
         dialog.run()
         dialog.destroy()
 
-    def _run_and_log(self, cmd, cwd=None):
+    def _run_and_log(self, cmd, cwd=None, out=None, limits=False):
+        # out 為 list 時只收集輸出, 由呼叫者整段送出
+        # limits=True: 套用 SIM_TIMEOUT / SIM_MAX_OUTPUT / rlimit / nice, 可被 Cancel, 在自己的 process group 執行
+        # 回傳 (returncode, killed), killed 為 None / "TIMEOUT" / "CANCELLED" / "RESOURCE"
         try:
-            p = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
-            for line in iter(p.stdout.readline, ''):
-                sys.__stdout__.write(line)
-                sys.__stdout__.flush()
-                GLib.idle_add(self.gui_sync_output, line)
-            p.stdout.close()
-            p.wait()
+            rc, killed, why = self.runner.run(cmd, cwd=cwd, on_line=out.append if out is not None else self._stream_line,
+                                              limits=limits)
         except Exception as e:
             err = f"[playV] 指令失敗: {' '.join(cmd)}: {e}\n"
             sys.__stderr__.write(err)
-            GLib.idle_add(self.gui_sync_output, err)
+            if out is not None:
+                out.append(err)
+            else:
+                self.pump.put(err)
+            return None, None
+        if killed:
+            self._report_killed(f"{killed} ({why}): {' '.join(cmd)}")
+        return rc, killed
+
+    def _stream_line(self, line):
+        sys.__stdout__.write(line)
+        sys.__stdout__.flush()
+        self.pump.put(line)
+
+    def _report_divergence(self, d, prob_name=None):
+        # 緊接在不一致的那一行後面, 用 diverge tag 標出來
+        where = f"{prob_name}: " if prob_name else ""
+        msg = f"[playV] {where}{format_divergence(d)}\n"
+        sys.__stderr__.write(msg)
+        self.pump.put(msg, raw=True, tag="diverge")
+
+    def _report_killed(self, detail):
+        msg = f"[playV] {detail}\n"
+        sys.__stderr__.write(msg)
+        self.pump.put(msg, raw=True)
+
+    def on_cancel_clicked(self, *_):
+        self.runner.cancel()
+        if self.coordinator:
+            self.coordinator.cancel()
+
+    def _update_time(self, lab, prob, seconds):
+        self.durations[(lab, prob)] = seconds
+        it = self.row_map.get((lab, prob))
+        if it:
+            self.store.set(it, (TIME_COL,), (format_duration(seconds),))
 
-    @staticmethod
-    def _read_status():
-        try:
-            txt = (pathlib.Path.cwd() / SRES_DIR / "result.txt").read_text().strip().lower()
-            return "PASS" if txt == "pass" else "FAIL"
-        except Exception:
-            return "FAIL"
+    def show_timing_summary(self, *_):
+        # 依最近一次耗時排序, trend 為最近一次相對之前中位數的變化
+        rows = summarize_history(load_history(self.labs_root))
+        dialog = Gtk.Dialog(title="Simulation Timing", parent=None, modal=True)
+        dialog.set_resizable(True)
+        dialog.add_button("OK", Gtk.ResponseType.OK)
+        store = Gtk.ListStore(str, int, str, str, str, str, str, str)
+        for r in rows:
+            try:
+                name = str(pathlib.Path(r["path"]).relative_to(self.labs_root))
+            except ValueError:
+                name = r["path"]
+            trend = "" if r["trend"] is None else f"{r['trend']:+.0%}"
+            size = "" if r["output_bytes"] is None else f"{r['output_bytes'] / 1024:.0f} KiB"
+            store.append([name, r["runs"], format_duration(r["last"]), format_duration(r["mean"]),
+                          format_duration(r["best"]), format_duration(r["first_output"]), size, trend])
+        view = Gtk.TreeView(model=store)
+        for idx, title in enumerate(["problem", "runs", "last", "mean", "best", "first output", "output", "trend"]):
+            col = Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=idx)
+            col.set_sort_column_id(idx)
+            view.append_column(col)
+        sw = Gtk.ScrolledWindow()
+        sw.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        sw.set_min_content_width(900)
+        sw.set_min_content_height(400)
+        sw.add(view)
+        dialog.get_content_area().pack_start(sw, True, True, 0)
+        dialog.show_all()
+        dialog.run()
+        dialog.destroy()
 
     def _update_status(self, lab, prob, status):
-        it = self.row_map.get((lab, prob))
-        if it:
-            self.store.set(it, (STATUS_COL,), (status,))
+        # 先記下來, 每 STATUS_BATCH_MS 一起寫進 store; Simulation All 幾千題時才不會每題重算 filter / sort
+        self._pending_status[(self.board, lab, prob)] = status
+        if self._status_flush_id is None:
+            self._status_flush_id = GLib.timeout_add(STATUS_BATCH_MS, self._on_status_timer)
+        return False
+
+    def _set_statuses(self, board, statuses):
+        # 整批一次寫進 store (Reset Simulation All)
+        for (lab, prob), status in statuses.items():
+            self._pending_status[(board, lab, prob)] = status
+        self._flush_status()
+        return False
+
+    def _on_status_timer(self):
+        self._status_flush_id = None
+        self._flush_status()
+        return False
+
+    def _flush_status(self):
+        if self._status_flush_id is not None:
+            GLib.source_remove(self._status_flush_id)
+            self._status_flush_id = None
+        pending, self._pending_status = self._pending_status, {}
+        for (board, lab, prob), status in pending.items():
+            it = board.row_map.get((lab, prob))
+            if it:
+                self.store.set(it, (STATUS_COL,), (status,))
+        if pending and self.status_filter != "all":
+            self._update_row_count()
 
     def open_vscode(self, *_):
         cwd = pathlib.Path.cwd() / DSRC_DIR
@@ -481,37 +1123,117 @@ class playV(Gtk.Application):
 
     def open_gtkwave(self, *_):
         wave = pathlib.Path.cwd() / SRES_DIR / "wave.vcd"
-        if wave.is_file():
-            threading.Thread(target=self._run_and_log, args=(["gtkwave", str(wave)],), daemon=True).start()
+        if wave_exists(wave):
+            golden = pathlib.Path.cwd() / GOLDEN_DIR / "golden_wave.vcd"
+            threading.Thread(target=self._open_wave, args=(wave, golden), daemon=True).start()
         else:
             msg = "[playV] wave.vcd 不存在\n"
             sys.stderr.write(msg)
-            GLib.idle_add(self.gui_sync_output, msg)
+            self.pump.put(msg)
 
     def show_golden_log(self, *_):
         golden_log = pathlib.Path.cwd() / GOLDEN_DIR / "golden_log.txt"
         prob_name = self.current_prob or "(unnamed)"
-        self.append_to_terminal(f"【{prob_name}】 golden\n")
         try:
             content = golden_log.read_text().strip()
         except Exception as e:
             content = f"[playV] 無法讀取 golden_log.txt: {e}"
+        lines = [f"【{prob_name}】 golden\n"]
         for line in content.splitlines():
             if line.strip().startswith("##"):
                 continue
-            self.append_to_terminal(line + "\n")
+            lines.append(line + "\n")
+        self.append_to_terminal("".join(lines))
 
     def open_gtkwave_golden(self, *_):
         wave = pathlib.Path.cwd() / GOLDEN_DIR / "golden_wave.vcd"
         if wave.is_file():
-            threading.Thread(target=self._run_and_log, args=(["gtkwave", str(wave)],), daemon=True).start()
+            threading.Thread(target=self._open_wave, args=(wave, None), daemon=True).start()
         else:
             msg = "[playV] golden_wave.vcd 不存在\n"
             sys.stderr.write(msg)
-            GLib.idle_add(self.gui_sync_output, msg)
+            self.pump.put(msg)
+
+    def compare_waves(self, *_):
+        wave = pathlib.Path.cwd() / SRES_DIR / "wave.vcd"
+        golden = pathlib.Path.cwd() / GOLDEN_DIR / "golden_wave.vcd"
+        for f in (wave, golden):
+            if not wave_exists(f):
+                msg = f"[playV] {f.name} 不存在\n"
+                sys.__stderr__.write(msg)
+                self.pump.put(msg, raw=True)
+                return
+        prob_name = self.current_prob or "(unnamed)"
+        threading.Thread(target=self._compare_waves, args=(prob_name, golden, wave), daemon=True).start()
+
+    def _compare_waves(self, prob_name, golden, wave):
+        try:
+            result = compare_vcd(golden, local_wave(wave), COMPARE_MAX)
+            if result["mismatches"]:
+                self.first_mismatch[str(wave.parent.parent)] = result["mismatches"][0][0]
+            report = format_report(result)
+        except Exception as e:
+            report = f"[playV] 無法比對波形: {e}\n"
+        self.pump.put(f"【{prob_name}】 wave vs golden\n{report}", raw=True)
+
+    def _open_wave(self, wave, golden):
+        # worker thread: 大檔先找第一個不一致 (golden 為 None 時用上次比對的結果), 只切那一段給 gtkwave
+        probdir = str(wave.parent.parent)
+        wave = target = local_wave(wave)
+        if wave.stat().st_size > SLICE_BYTES:
+            try:
+                t = self.first_mismatch.get(probdir)
+                if t is None and golden is not None and golden.is_file():
+                    result = compare_vcd(golden, wave, 1)
+                    if result["mismatches"]:
+                        t = self.first_mismatch[probdir] = result["mismatches"][0][0]
+                if t is not None:
+                    target = self._slice_wave(wave, t)
+            except Exception as e:
+                msg = f"[playV] 無法切出波形片段, 開啟完整檔案: {e}\n"
+                sys.__stderr__.write(msg)
+                self.pump.put(msg, raw=True)
+        self._run_and_log(["gtkwave", str(target)])
+
+    def _slice_wave(self, wave, t):
+        idx = VCDIndex.open(wave)
+        lo, hi = idx.window_around(t)
+        key = hashlib.sha1(str(wave.resolve()).encode()).hexdigest()[:12]
+        SLICE_DIR.mkdir(parents=True, exist_ok=True)
+        for old in SLICE_DIR.glob(f"{key}-*.vcd"):
+            old.unlink(missing_ok=True)
+        out = idx.slice(SLICE_DIR / f"{key}-{lo}-{hi}.vcd", lo, hi)
+        size_mb = wave.stat().st_size / (1024 * 1024)
+        self.pump.put(f"[playV] {wave.name} is {size_mb:.0f} MB; opening #{lo}..#{hi} around first mismatch at #{t}\n",
+                      raw=True)
+        return out
+
+    def lookup_wave_value(self, entry):
+        text = entry.get_text().replace("@", " ").split()
+        if len(text) != 2 or not text[1].isdigit():
+            self.append_to_terminal("[playV] usage: <signal> @ <time>\n")
+            return
+        cwd = pathlib.Path.cwd()
+        waves = [("golden", cwd / GOLDEN_DIR / "golden_wave.vcd"), ("yours", cwd / SRES_DIR / "wave.vcd")]
+        threading.Thread(target=self._lookup_wave_value, args=(text[0], int(text[1]), waves), daemon=True).start()
+
+    def _lookup_wave_value(self, name, time, waves):
+        parts = []
+        for label, path in waves:
+            try:
+                value = VCDIndex.open(local_wave(path)).value_at(name, time) if wave_exists(path) else None
+            except Exception as e:
+                value = f"error: {e}"
+            parts.append(f"{label} {value if value is not None else '-'}")
+        self.pump.put(f"[playV] {name} @ #{time}: {', '.join(parts)}\n", raw=True)
 
     def set_busy(self, flag):
         self._busy = flag
+        if flag:
+            self.runner.cancel_event.clear()
+            # 每次執行換一個 terminal spill log
+            self.term_spill.close()
+            self.term_spill = SpillFile("terminal")
         for w in self.all_buttons:
             w.set_sensitive(not flag)
         self.tree.set_sensitive(not flag)    # 只有指令執行時才同步鎖定選單
@@ -534,6 +1256,13 @@ class playV(Gtk.Application):
             self.btn_refresh_status.set_sensitive(True)
             self.btn_reset_all.set_sensitive(True)
             self.btn_test_all.set_sensitive(True)
+            self.spin_jobs.set_sensitive(True)
+            self.chk_force.set_sensitive(True)
+            self.chk_golden.set_sensitive(True)
+            self.chk_fail_fast.set_sensitive(True)
+            self.chk_smart.set_sensitive(True)
+            self.spin_stop_after.set_sensitive(True)
+            self.btn_timing.set_sensitive(True)
 
     def _show_cwd(self, dirpath):
         try:
@@ -542,7 +1271,7 @@ class playV(Gtk.Application):
         except Exception as e:
             msg = f"[playV] CWD 切換失敗: {dirpath}: {e}\n"
             sys.stderr.write(msg)
-            GLib.idle_add(self.gui_sync_output, msg)
+            self.pump.put(msg)
         return False
 
     def _restore_selected_cwd(self):
@@ -560,54 +1289,156 @@ class playV(Gtk.Application):
         self.set_busy(True)
         threading.Thread(target=self._refresh_all_status, daemon=True).start()
 
-    def _refresh_all_status(self):
-        self.subdirs = sorted(
-            p for p in self.labs_root.iterdir()
-            if p.is_dir() and not p.name.startswith('.')
+    def _refresh_all_status(self, known=None, release_busy=True, stream=()):
+        # worker thread: 掃目錄與讀 result.txt 都不在 GTK main thread 做
+        # known: {board: {(lab, prob): (status, mtime)}}; stream 裡的 board 每掃完一個 lab 就先把它的 row (NULL) 加到 score board
+        known = known or {}
+        updates = []
+        for board in self.boards:
+            subdirs, child_map = [], {}
+            try:
+                for lab, children in iter_discover(board.labs_root):
+                    subdirs.append(lab)
+                    child_map[lab] = children
+                    if board in stream:
+                        GLib.idle_add(self._stream_lab, board, lab, children)
+            except OSError as e:
+                print(f"[Warning] Failed to read {board.labs_root}: {e}", file=sys.stderr)
+            rows = read_all_results(subdirs, child_map, known.get(board))
+            updates.append((board, subdirs, child_map, rows, last_durations(board.labs_root)))
+        GLib.idle_add(self._refresh_store_and_status, updates, release_busy)
+        # status cache 也在這裡寫, 不佔 main loop (~/.cache 可能在 NFS 上)
+        for board, subdirs, child_map, rows, _ in updates:
+            save_status_cache(board.labs_root, subdirs, child_map, rows)
+
+    def _stream_lab(self, board, lab, children):
+        if lab in board.child_map:
+            return False
+        board.subdirs.append(lab)
+        board.child_map[lab] = children
+        for prob in children or [None]:
+            key = (lab.name, prob.name if prob else "")
+            board.row_map[key] = self.store.append([key[0], key[1], "NULL", "", board.student])
+        if board is self.board:
+            self.combo_parent.append_text(lab.name)
+            if self.combo_parent.get_active() < 0:
+                self.combo_parent.set_active(0)
+        self._update_row_count()
+        return False
+
+    def _check_labs_found(self, subdirs, child_map):
+        # 啟動時第一次掃描結束才檢查, 沒有 lab 或題目就結束程式
+        if not subdirs:
+            text = "⚠️ No lab folders found in LABSROOT."
+        elif all(len(children) == 0 for children in child_map.values()):
+            # Prevent proceeding if all subdirectories are also empty (e.g. lab1 has no content)
+            text = "⚠️ No problems found in any lab folders."
+        else:
+            print(f"✅ labs: {[p.name for p in subdirs]}")
+            return True
+        dialog = Gtk.MessageDialog(
+            message_type=Gtk.MessageType.ERROR,
+            buttons=Gtk.ButtonsType.CLOSE,
+            text=text
         )
-        self.child_map = {
-            p: sorted(
-                c for c in p.iterdir()
-                if c.is_dir() and not c.name.startswith('.')
-            )
-            for p in self.subdirs
-        }
-
-        GLib.idle_add(self._refresh_store_and_status)
-
-    def _refresh_store_and_status(self):
-        self.store.clear()
-        self.row_map.clear()
-        for lab in self.subdirs:
-            probs = self.child_map[lab] or [""]
-            for prob in probs:
-                p_name = prob.name if isinstance(prob, pathlib.Path) else prob
-                it = self.store.append([lab.name, p_name, "NULL"])
-                self.row_map[(lab.name, p_name)] = it
-                dirpath = lab / p_name if p_name else lab
-                result_file = dirpath / SRES_DIR / "result.txt"
-                try:
-                    txt = result_file.read_text().strip().lower()
-                    status = "PASS" if txt == "pass" else "FAIL"
-                except Exception:
-                    status = "NULL"
-                self.store.set(it, (STATUS_COL,), (status,))
+        dialog.set_modal(True)
+        dialog.run()
+        dialog.destroy()
+        self.quit()
+        return False
+
+    def _refresh_store_and_status(self, updates, release_busy=True):
+        # updates: [(board, subdirs, child_map, rows, durations)]
+        # 建一個沒接在 TreeView 上的新 store 一次填好再換上去; 沒在 updates 裡的 board 照抄原本的 row
+        if self._startup:
+            self._startup = False
+            # 只有一個 root 時才檢查; 多個學生時空的 root 就是沒有 row
+            if not self.multi_root and not self._check_labs_found(updates[0][1], updates[0][2]):
+                return False
+        self._flush_status()
+        fresh = {update[0]: update for update in updates}
+        store = Gtk.ListStore(str, str, str, str, str)
+        for board in self.boards:
+            row_map = {}
+            if board in fresh:
+                _, subdirs, child_map, rows, durations = fresh[board]
+                if durations is not None:
+                    board.durations = durations
+                for lab, prob, status, mtime in rows:
+                    time_text = format_duration(board.durations.get((lab, prob)))
+                    row_map[(lab, prob)] = store.append([lab, prob, status, time_text, board.student])
+                board.subdirs = subdirs
+                board.child_map = child_map
+                board.result_mtimes = {(lab, prob): mtime for lab, prob, status, mtime in rows}
+            else:
+                for key, it in board.row_map.items():
+                    row_map[key] = store.append(list(self.store.get(it, 0, 1, STATUS_COL, TIME_COL, STUDENT_COL)))
+            board.row_map = row_map
+        self._attach_store(store)
+        self._refresh_parent_options()
         self.refresh_child_options()
         self.switch_to_selected()
-        self.set_busy(False)
+        if release_busy:
+            self.set_busy(False)
+        if self.watcher:
+            self.watcher.sync()
+
+    # --- 以下為 StatusWatcher 的增量更新, 都在 main thread 執行 ---
+
+    def _row_keys(self):
+        for lab in self.subdirs:
+            for prob in self.child_map.get(lab) or [None]:
+                yield (lab.name, prob.name if prob else "")
+
+    def _sync_rows(self, statuses):
+        # 依 subdirs/child_map 增刪 store 的 row, 其他 row 不動; 新 row 的狀態由 statuses 給
+        keys = list(self._row_keys())
+        wanted = set(keys)
+        for key in [k for k in self.row_map if k not in wanted]:
+            self.store.remove(self.row_map.pop(key))
+        successor = None
+        for key in reversed(keys):
+            if key not in self.row_map:
+                row = [key[0], key[1], statuses.get(key, "NULL"), format_duration(self.durations.get(key)),
+                       self.board.student]
+                if successor is None:
+                    self.row_map[key] = self.store.append(row)
+                else:
+                    self.row_map[key] = self.store.insert_before(self.row_map[successor], row)
+            successor = key
+
+    def _apply_structure(self, subdirs, child_map, statuses):
+        old_subdirs, old_child_map = self.subdirs, self.child_map
+        self.subdirs, self.child_map = subdirs, child_map
+        self._sync_rows(statuses)
+        if subdirs != old_subdirs:
+            self._refresh_parent_options()
+            return
+        active = self.combo_parent.get_active()
+        if self._busy or not 0 <= active < len(subdirs):
+            return
+        lab = subdirs[active]
+        if child_map.get(lab) != old_child_map.get(lab):
+            self._combo_ignore = True
+            current = self.combo_child.get_active_text()
+            self.refresh_child_options()
+            names = [c.name for c in child_map.get(lab) or []]
+            if current in names:
+                self.combo_child.set_active(names.index(current))
+            self._combo_ignore = False
+
+    def _refresh_parent_options(self):
+        active = self.combo_parent.get_active_text()
+        names = [p.name for p in self.subdirs]
+        self._combo_ignore = True
+        self.combo_parent.remove_all()
+        for name in names:
+            self.combo_parent.append_text(name)
+        self.combo_parent.set_active(names.index(active) if active in names else 0)
+        self._combo_ignore = False
 
     def _reload_lab_structure(self):
-        self.subdirs = sorted(
-            p for p in self.labs_root.iterdir()
-            if p.is_dir() and not p.name.startswith('.')
-        )
-        self.child_map = {
-            p: sorted(
-                c for c in p.iterdir()
-                if c.is_dir() and not c.name.startswith('.')
-            )
-            for p in self.subdirs
-        }
+        self.subdirs, self.child_map = discover(self.labs_root)
 
     def on_reset_all_clicked(self, *_):
         if self._busy:
@@ -616,25 +1447,46 @@ class playV(Gtk.Application):
         threading.Thread(target=self._reset_all, daemon=True).start()
 
     def _reset_all(self):
+        # 只刪 sim_result 的題目直接 rmtree, clean 另有步驟的才跑 make clean; 不再逐題 chdir
         self._reload_lab_structure()
-        for lab in self.subdirs:
-            for prob in self.child_map[lab] or [None]:
-                if prob:
-                    dirpath = lab / prob.name
-                    prob_name = prob.name
-                else:
-                    dirpath = lab
-                    prob_name = ""
-                GLib.idle_add(self._show_cwd, dirpath)
-                self._run_and_log(["make", "clean"], cwd=dirpath)
-                GLib.idle_add(self._update_status, lab.name, prob_name, "NULL")
-        GLib.idle_add(self.set_busy, False)
-        GLib.idle_add(self._restore_selected_cwd)
+        board = self.board
+        jobs = list(iter_problems(self.subdirs, self.child_map))
+        statuses = {}
+        direct = via_make = 0
+        try:
+            with ThreadPoolExecutor(max_workers=READ_WORKERS) as pool:
+                futures = {pool.submit(self._reset_one, dirpath): (lab_name, prob_name, dirpath)
+                           for lab_name, prob_name, dirpath in jobs}
+                for f in as_completed(futures):
+                    lab_name, prob_name, dirpath = futures[f]
+                    status, detail, used_make, out = f.result()
+                    if status == "CANCELLED" and not used_make:
+                        continue
+                    statuses[(lab_name, prob_name)] = status
+                    if used_make:
+                        via_make += 1
+                        self.pump.put(format_output_block(prob_name or lab_name, out), raw=True)
+                    else:
+                        direct += 1
+                    if detail:
+                        self._report_killed(f"{detail}: {dirpath}")
+        finally:
+            self.pump.put(f"[playV] reset {direct} problem(s) directly, {via_make} with make clean\n", raw=True)
+            GLib.idle_add(self._set_statuses, board, statuses)
+            GLib.idle_add(self.set_busy, False)
+            GLib.idle_add(self._restore_selected_cwd)
+
+    def _reset_one(self, dirpath):
+        out = []
+        status, detail, used_make = reset_problem(self.runner, dirpath, on_line=out.append)
+        return status, detail, used_make, out
 
     def on_test_all_clicked(self, *_):
         if self._busy:
             return
         self.set_busy(True)
+        if monitor:
+            monitor.start_profile("simulation-all")
         threading.Thread(target=self._test_all, daemon=True).start()
 
     def on_clear_terminal_clicked(self, *_):
@@ -642,52 +1494,168 @@ class playV(Gtk.Application):
 
     def _test_all(self):
         self._reload_lab_structure()
-        for lab in self.subdirs:
-            for prob in self.child_map[lab] or [None]:
-                if prob:
-                    dirpath = lab / prob.name
-                    prob_name = prob.name
+        board = self.board
+        parallel = self.jobs > 1 or bool(self._dist_coordinator())
+        jobs = schedule_problems(iter_problems(self.subdirs, self.child_map), dict(self.durations), parallel,
+                                 self.schedule)
+        GLib.idle_add(self._mark_queued, board, [(lab, prob) for lab, prob, _ in jobs])
+        skipped = cached = failures = not_started = in_place = 0
+        try:
+            for lab_name, prob_name, res, out in self._completed_tests(jobs):
+                if res["detail"] == NOT_STARTED:
+                    # 還沒開始就取消 (Cancel / stop after): 換回原本的狀態
+                    not_started += 1
+                    GLib.idle_add(self._unqueue, board, lab_name, prob_name)
+                    continue
+                GLib.idle_add(self._update_status, lab_name, prob_name, res["status"])
+                if res["skipped"]:
+                    skipped += 1
+                    continue
+                if res["in_place"]:
+                    in_place += 1
+                if res["cached"]:
+                    cached += 1
                 else:
-                    dirpath = lab
-                    prob_name = ""
-                self.current_lab = lab.name
-                self.current_prob = prob.name if prob else ""
-                GLib.idle_add(self._show_cwd, dirpath)
-                self._run_and_log(["make", "test"], cwd=dirpath)
-                status = "FAIL"
-                try:
-                    txt = (dirpath / SRES_DIR / "result.txt").read_text().strip().lower()
-                    if txt == "pass":
-                        status = "PASS"
-                except Exception:
-                    status = "FAIL"
-                GLib.idle_add(self._update_status, lab.name, prob_name, status)
-        GLib.idle_add(self.set_busy, False)
-        GLib.idle_add(self._restore_selected_cwd)
+                    GLib.idle_add(self._update_time, lab_name, prob_name, res["duration"])
+                sys.__stdout__.write("".join(out))
+                sys.__stdout__.flush()
+                self.pump.put(format_output_block(prob_name, out), raw=True)
+                if res["diverged"]:
+                    self._report_divergence(res["diverged"], prob_name or lab_name)
+                if self.stop_after and counts_as_failure(res):
+                    failures += 1
+                    if failures == self.stop_after:
+                        self.pump.put(f"[playV] {failures} failure(s), cancelling the remaining problems (stop after)\n",
+                                      raw=True)
+                        self.runner.cancel()
+                        if self.coordinator:
+                            self.coordinator.cancel()
+        finally:
+            if skipped:
+                self.pump.put(f"[playV] {skipped} problem(s) unchanged, skipped (check 'force' to rerun)\n", raw=True)
+            if cached:
+                self.pump.put(f"[playV] {cached} problem(s) replayed from the artifact cache\n", raw=True)
+            if not_started:
+                self.pump.put(f"[playV] {not_started} problem(s) cancelled before they started\n", raw=True)
+            if in_place:
+                self.pump.put(f"[playV] {in_place} problem(s) ran in place, not in scratch or on a worker "
+                              f"(their Makefile uses files outside the problem directory)\n", raw=True)
+            GLib.idle_add(self._report_output_stats)
+            GLib.idle_add(self.set_busy, False)
+            GLib.idle_add(self._restore_selected_cwd)
+            if monitor:
+                GLib.idle_add(monitor.stop_profile)
+
+    def _mark_queued(self, board, keys):
+        # 排進 Simulation All 的題目先標成 QUEUED, 記下原本的狀態 (取消時換回去)
+        self._flush_status()
+        prev = {}
+        for lab, prob in keys:
+            it = board.row_map.get((lab, prob))
+            if it:
+                prev[(board, lab, prob)] = self._settled_status(board, lab, prob, self.store[it][STATUS_COL])
+        self._queued_prev = prev
+        self._set_statuses(board, {key: "QUEUED" for key in keys})
+        return False
+
+    def _unqueue(self, board, lab, prob):
+        self._pending_status[(board, lab, prob)] = self._queued_prev.get((board, lab, prob), "NULL")
+        if self._status_flush_id is None:
+            self._status_flush_id = GLib.timeout_add(STATUS_BATCH_MS, self._on_status_timer)
+        return False
+
+    def _dist_coordinator(self):
+        # 設了 PLAYV_DIST / PLAYV_DIST_LOCAL 時第一次用到才建立; 沒有時回傳 False
+        if self.coordinator is None and (os.environ.get("PLAYV_DIST") or os.environ.get("PLAYV_DIST_LOCAL")):
+            self.coordinator = dist_from_env() or False
+        return self.coordinator
+
+    def _completed_tests(self, jobs):
+        # 產生 (lab, prob, result, 輸出行), 依完成順序; 設了 PLAYV_DIST / PLAYV_DIST_LOCAL 時交給 worker
+        # jobs 已由 schedule_problems 排好, 依序開始
+        if self._dist_coordinator():
+            dirs = {(lab, prob): dirpath for lab, prob, dirpath in jobs}
+            for lab_name, prob_name, res, out in self.coordinator.run(jobs, self.force_all, self.golden_check,
+                                                                      self.fail_fast, dict(self.durations),
+                                                                      ordered=self.schedule == "smart"):
+                if res["detail"] and res["detail"] != NOT_STARTED:
+                    self._report_killed(f"{res['detail']}: {dirs[(lab_name, prob_name)]}")
+                yield lab_name, prob_name, res, out
+            return
+        # 機器忙 (load average / 可用記憶體) 時 Throttle 會少跑幾題
+        throttle = Throttle(self.jobs, self.runner.cancel_event)
+        with ThreadPoolExecutor(max_workers=max(1, self.jobs)) as pool:
+            futures = [pool.submit(self._test_one, *job, throttle) for job in jobs]
+            for f in as_completed(futures):
+                yield f.result()
+        if throttle.waits:
+            self.pump.put(f"[playV] machine busy: {throttle.waits} problem(s) waited for a free slot "
+                          f"(at most {throttle.peak} ran at once)\n", raw=True)
+
+    def _test_one(self, lab_name, prob_name, dirpath, throttle):
+        # worker thread: 各題自帶 cwd, 不動全域 os.chdir
+        out = []
+        self.first_mismatch.pop(str(dirpath), None)
+        with throttle.slot():
+            if not self.runner.cancel_event.is_set():
+                GLib.idle_add(self._update_status, lab_name, prob_name, "RUNNING")
+            res = simulate_problem(self.runner, dirpath, on_line=out.append, force=self.force_all,
+                                   golden_check=self.golden_check, fail_fast=self.fail_fast,
+                                   artifacts=None if self.force_all else self.artifacts, scratch=self.scratch)
+        if res["detail"] and res["detail"] != NOT_STARTED:
+            self._report_killed(f"{res['detail']}: {dirpath}")
+        return lab_name, prob_name, res, out
 
     def on_reset_all_design_clicked(self, *_):
+        if self._busy:
+            return
         dialog = Gtk.MessageDialog(
             message_type=Gtk.MessageType.WARNING,
-            buttons=Gtk.ButtonsType.YES_NO,
+            buttons=Gtk.ButtonsType.NONE,
             text="Will erase all of your Verilog code. Do you want to continue?"
         )
+        # 只重設選到的 lab / 題目也可以
+        dialog.add_button("Cancel", Gtk.ResponseType.CANCEL)
+        if self.current_lab is not None:
+            if self.current_prob:
+                dialog.add_button(f"Only {self.current_lab}/{self.current_prob}", SYNC_PROBLEM)
+            dialog.add_button(f"Only {self.current_lab}", SYNC_LAB)
+        dialog.add_button("Every Lab", Gtk.ResponseType.YES)
         dialog.set_modal(True)
         response = dialog.run()
         dialog.destroy()
 
-        if response == Gtk.ResponseType.YES:
+        if response in (Gtk.ResponseType.YES, SYNC_LAB, SYNC_PROBLEM):
             dev_root = os.environ.get("LABS_DEV_ROOT")
             pub_root = os.environ.get("LABS_PUBLIC_ROOT")
             if not dev_root or not pub_root:
                 self.append_to_terminal("[playV] LABS_DEV_ROOT or LABS_PUBLIC_ROOT not set.\n")
                 return
-            cmd = f'''
-                    git -C "{dev_root}" pull
-                    rm -rf "{pub_root}"/lab*
-                    cp -r "{dev_root}"/lab*/ "{pub_root}"/
-                    '''
-            threading.Thread(target=self._run_and_log, args=(["bash", "-c", cmd],), daemon=True).start()
-            threading.Thread(target=self._refresh_all_status, daemon=True).start()
+            scope = None
+            if response == SYNC_LAB:
+                scope = self.current_lab
+            elif response == SYNC_PROBLEM:
+                scope = f"{self.current_lab}/{self.current_prob}"
+            self.set_busy(True)
+            threading.Thread(target=self._reset_designs, args=(dev_root, pub_root, scope), daemon=True).start()
+
+    def _reset_designs(self, dev_root, pub_root, scope):
+        # 只複製 / 刪除有差異的檔案; 同步完才重新整理狀態
+        try:
+            self._run_and_log(["git", "-C", dev_root, "pull"])
+            self.pump.put(f"[playV] syncing {scope or 'lab*'} from {dev_root} to {pub_root}\n", raw=True)
+            last = [0.0]
+            def progress(done, total, path):
+                now = time.monotonic()
+                if done == total or now - last[0] >= 0.5:
+                    last[0] = now
+                    self.pump.put(f"[playV] sync {done}/{total}: {path}\n", raw=True)
+            stats = sync_labs(dev_root, pub_root, scope, on_progress=progress, cancel_event=self.runner.cancel_event)
+            cancelled = " (cancelled)" if self.runner.cancel_event.is_set() else ""
+            self.pump.put(f"[playV] sync done{cancelled}: {format_sync_stats(stats)}\n", raw=True)
+        except Exception as e:
+            self._report_killed(f"sync failed: {e}")
+        self._refresh_all_status()
 
 if __name__ == "__main__":
     playV().run()
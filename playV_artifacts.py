@@ -0,0 +1,161 @@
+# make test 結果的快取: sim_result 與輸出, key 為題目輸入 (含 Makefile 用到的目錄外檔案) 與模擬器版本的 hash
+# 命中時不跑模擬, 直接還原結果; 預設關閉 (PLAYV_ARTIFACT_CACHE=1 或 --cache), 只有 Simulation All 會用
+import os, sys, json, shutil, hashlib, pathlib, tempfile, threading, subprocess
+
+from playV_core import CACHE_DIR, SRES_DIR, GOLDEN_DIR, MANIFEST_NAME, outside_inputs
+
+ARTIFACT_DIR = CACHE_DIR / "artifacts"
+ARTIFACT_CACHE = os.environ.get("PLAYV_ARTIFACT_CACHE", "") not in ("", "0")
+ARTIFACT_MAX_BYTES = int(float(os.environ.get("PLAYV_ARTIFACT_CACHE_MB", "2048")) * 1024 * 1024)
+ARTIFACT_VERSION = 2
+
+# 版本字串算進 key; 換了模擬器版本就不會拿到舊結果
+TOOLCHAIN_CMDS = (["iverilog", "-V"], ["vvp", "-V"], ["verilator", "--version"])
+
+_toolchain = None
+_toolchain_lock = threading.Lock()
+
+def toolchain_version():
+    # 每個 process 只跑一次; PLAYV_TOOLCHAIN 可直接指定
+    global _toolchain
+    with _toolchain_lock:
+        if _toolchain is None:
+            versions = [os.environ.get("PLAYV_TOOLCHAIN", "")]
+            for cmd in TOOLCHAIN_CMDS:
+                try:
+                    out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                         text=True, timeout=10).stdout
+                except (OSError, subprocess.SubprocessError):
+                    continue
+                versions.append(f"{cmd[0]}: {out.strip().splitlines()[0] if out.strip() else '?'}")
+            _toolchain = "\n".join(versions)
+        return _toolchain
+
+class ArtifactCache:
+    # 所有 worker thread 共用; 檔案 hash 依 (size, mtime) 記住, 同一個 session 不重讀
+    def __init__(self, root=ARTIFACT_DIR, max_bytes=ARTIFACT_MAX_BYTES):
+        self.root = pathlib.Path(root)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.digests = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _file_digest(self, path, st):
+        memo = (st.st_size, st.st_mtime_ns)
+        cached = self.digests.get(path)
+        if cached and cached[0] == memo:
+            return cached[1]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self.digests[path] = (memo, digest)
+        return digest
+
+    def _hash_tree(self, h, top, label):
+        # top 底下 (或 top 這個檔案) sim_result 與 . 開頭以外的檔案; golden 只看大小與 mtime
+        if top.is_file():
+            h.update(f"{label}\0{self._file_digest(str(top), os.stat(top))}\n".encode())
+            return
+        for root, dirs, files in os.walk(top):
+            dirs[:] = sorted(x for x in dirs if not x.startswith(".") and x != SRES_DIR)
+            golden = os.path.relpath(root, top).split(os.sep)[0] == GOLDEN_DIR
+            for name in sorted(files):
+                if name.startswith("."):
+                    continue
+                path = os.path.join(root, name)
+                st = os.stat(path)
+                rel = os.path.join(label, os.path.relpath(path, top))
+                digest = f"{st.st_size}:{st.st_mtime_ns}" if golden else self._file_digest(path, st)
+                h.update(f"{rel}\0{digest}\n".encode())
+
+    def key(self, dirpath):
+        # 題目目錄 (sim_result 以外) 加上 Makefile 用到的外部檔案; 讀不到時回傳 None (不用 cache)
+        d = pathlib.Path(dirpath).resolve()
+        h = hashlib.sha256(f"playV-artifacts {ARTIFACT_VERSION}\n{toolchain_version()}\n".encode())
+        try:
+            outside = outside_inputs(d)
+            if outside is None:
+                return None
+            self._hash_tree(h, d, ".")
+            for path in outside:
+                self._hash_tree(h, path, str(path))
+        except OSError as e:
+            print(f"[Warning] Failed to hash {d}: {e}", file=sys.stderr)
+            return None
+        return h.hexdigest()
+
+    def restore(self, key, dirpath):
+        # 命中時把 sim_result 換成快取內容, 回傳 (returncode, 輸出行); 沒有時回傳 None
+        entry = self.root / key
+        try:
+            meta = json.loads((entry / "meta.json").read_text())
+            lines = (entry / "log.txt").read_text(errors="replace").splitlines(keepends=True)
+            dest = pathlib.Path(dirpath) / SRES_DIR
+            shutil.rmtree(dest, ignore_errors=True)
+            if (entry / SRES_DIR).is_dir():
+                shutil.copytree(entry / SRES_DIR, dest)
+            os.utime(entry / "meta.json")
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return meta["returncode"], lines
+
+    def store(self, key, dirpath, lines, returncode):
+        sres = pathlib.Path(dirpath) / SRES_DIR
+        try:
+            size = sum(f.stat().st_size for f in sres.rglob("*") if f.is_file()) if sres.is_dir() else 0
+            log = "".join(lines)
+            size += len(log)
+            if size > self.max_bytes // 4:
+                return
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = pathlib.Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.root))
+        except OSError as e:
+            print(f"[Warning] Failed to cache artifacts of {dirpath}: {e}", file=sys.stderr)
+            return
+        try:
+            if sres.is_dir():
+                shutil.copytree(sres, tmp / SRES_DIR, ignore=shutil.ignore_patterns(MANIFEST_NAME))
+            (tmp / "log.txt").write_text(log)
+            (tmp / "meta.json").write_text(json.dumps({"returncode": returncode, "size": size, "source": str(dirpath)}))
+            os.rename(tmp, self.root / key)
+        except OSError as e:
+            # 另一個 thread 先存了同一個 key 也會走到這裡
+            if not (self.root / key).is_dir():
+                print(f"[Warning] Failed to cache artifacts of {dirpath}: {e}", file=sys.stderr)
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        # 超過上限時從最久沒用到的開始刪
+        with self.lock:
+            entries = []
+            try:
+                with os.scandir(self.root) as it:
+                    for e in it:
+                        if e.name.startswith(".") or not e.is_dir():
+                            continue
+                        try:
+                            meta = pathlib.Path(e.path) / "meta.json"
+                            entries.append((meta.stat().st_mtime, json.loads(meta.read_text())["size"], e.path))
+                        except (OSError, ValueError, KeyError):
+                            continue
+            except OSError:
+                return
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+def artifact_cache(enabled=ARTIFACT_CACHE):
+    # 沒開 (PLAYV_ARTIFACT_CACHE) 或 PLAYV_ARTIFACT_CACHE_MB=0 時回傳 None
+    return ArtifactCache() if enabled and ARTIFACT_MAX_BYTES > 0 else None
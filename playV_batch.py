@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# playV.py --batch: 不用 Gtk 的 Simulation All, 每題跑完印一行, 全部 PASS 才回傳 0
+# playV.py --batch --timing [N]: 列出 history 裡最慢的 N 題
+import sys, json, time, signal, argparse, pathlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from playV_core import (
+    SRES_DIR, GOLDEN_DIR, DEFAULT_JOBS, GOLDEN_CHECK, FAIL_FAST, SCHEDULE, STOP_AFTER, NOT_STARTED, Runner, Throttle,
+    labs_root_from_env, discover, iter_problems, schedule_problems, counts_as_failure, format_output_block,
+    simulate_problem, format_divergence, load_history, last_durations, summarize_history, format_duration,
+)
+from playV_vcd import compare_vcd, format_report
+from playV_artifacts import ARTIFACT_CACHE, artifact_cache
+from playV_scratch import SCRATCH_ROOT, SHM_ROOT, Scratch, local_wave
+from playV_dist import Coordinator, parse_address, authkey_from_env
+
+def parse_args(argv):
+    ap = argparse.ArgumentParser(prog="playV.py --batch", description="Run make test in every problem without a GUI.")
+    ap.add_argument("--root", type=pathlib.Path, help="labs root (default: $LABSROOT)")
+    ap.add_argument("--jobs", "-j", type=int, default=DEFAULT_JOBS, help=f"parallel simulations (default: {DEFAULT_JOBS})")
+    ap.add_argument("--json", type=pathlib.Path, help="write per-problem results to this file")
+    ap.add_argument("--incremental", action="store_true", help="skip problems whose inputs have not changed")
+    ap.add_argument("--verbose", "-v", action="store_true", help="print the student-visible output of each problem")
+    ap.add_argument("--compare", type=int, nargs="?", const=1, metavar="N",
+                    help="for failed problems, compare wave.vcd with golden_wave.vcd (stop after N mismatches)")
+    ap.add_argument("--golden-check", action="store_true", default=GOLDEN_CHECK,
+                    help="compare the visible output with golden_log.txt while it streams")
+    ap.add_argument("--fail-fast", action="store_true", default=FAIL_FAST,
+                    help="like --golden-check, but stop a simulation at its first difference")
+    ap.add_argument("--cache", action="store_true", default=ARTIFACT_CACHE,
+                    help="replay the results of earlier runs with the same inputs instead of simulating "
+                         "(default: $PLAYV_ARTIFACT_CACHE)")
+    ap.add_argument("--no-cache", dest="cache", action="store_false", help="always run make test (the default)")
+    ap.add_argument("--scratch", type=pathlib.Path, nargs="?", const=SHM_ROOT, default=SCRATCH_ROOT,
+                    metavar="DIR", help=f"run each problem in a local copy under DIR (default with no DIR: {SHM_ROOT})")
+    ap.add_argument("--dist", metavar="[HOST:]PORT",
+                    help="hand problems to playV_dist.py workers connecting here (key: $PLAYV_DIST_KEY)")
+    ap.add_argument("--local-workers", type=int, default=0, metavar="N",
+                    help="with --dist (or alone), also start N workers on this machine")
+    ap.add_argument("--schedule", choices=("smart", "alpha"), default=SCHEDULE,
+                    help="smart: failing and edited problems first, longest first when parallel; alpha: directory order")
+    ap.add_argument("--stop-after", type=int, default=STOP_AFTER, metavar="K",
+                    help="cancel the remaining problems after K failures (default: 0, never)")
+    ap.add_argument("--timing", type=int, nargs="?", const=20, metavar="N",
+                    help="print the N slowest problems from the run history and exit")
+    return ap.parse_args(argv)
+
+def compare_problem(dirpath, max_mismatches):
+    # 回傳 compare_vcd 的結果, 缺檔時為 None
+    wave = local_wave(dirpath / SRES_DIR / "wave.vcd")
+    golden = dirpath / GOLDEN_DIR / "golden_wave.vcd"
+    if not wave.is_file() or not golden.is_file():
+        return None
+    try:
+        return compare_vcd(golden, wave, max_mismatches)
+    except Exception as e:
+        print(f"[Warning] Failed to compare {wave}: {e}", file=sys.stderr)
+        return None
+
+def run_batch(labs_root, jobs=DEFAULT_JOBS, incremental=False, verbose=False, runner=None, compare=None,
+              golden_check=False, fail_fast=False, artifacts=None, scratch=None, coordinator=None,
+              schedule=SCHEDULE, stop_after=0):
+    # 回傳每題的結果 dict (lab, problem, status, returncode, duration, skipped, detail, diverged), 依完成順序
+    # compare 有給時, 沒過的題目多一個 wave 欄位 (compare_vcd 的結果)
+    # coordinator 有給時交給 playV_dist 的 worker 跑, jobs / artifacts / scratch 不用
+    # stop_after > 0: 失敗 stop_after 題後取消剩下的
+    runner = runner or Runner()
+    subdirs, child_map = discover(labs_root)
+    durations = last_durations(labs_root)
+    problems = schedule_problems(iter_problems(subdirs, child_map), durations, jobs > 1 or bool(coordinator), schedule)
+    results = []
+    failures = 0
+
+    def finish(lab, prob, dirpath, res):
+        res = dict(lab=lab, problem=prob, **res)
+        if compare is not None and res["status"] != "PASS":
+            res["wave"] = compare_problem(dirpath, compare)
+        return res
+
+    throttle = Throttle(jobs, runner.cancel_event)
+
+    def one(lab, prob, dirpath):
+        out = []
+        with throttle.slot():
+            res = simulate_problem(runner, dirpath, on_line=out.append, force=not incremental,
+                                   golden_check=golden_check, fail_fast=fail_fast, artifacts=artifacts,
+                                   scratch=scratch)
+        return finish(lab, prob, dirpath, res), out
+
+    def completed():
+        if coordinator:
+            dirs = {(lab, prob): dirpath for lab, prob, dirpath in problems}
+            for lab, prob, res, out in coordinator.run(problems, not incremental, golden_check, fail_fast, durations,
+                                                       ordered=schedule == "smart"):
+                yield finish(lab, prob, dirs[(lab, prob)], res), out
+            return
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            futures = [pool.submit(one, *job) for job in problems]
+            for f in as_completed(futures):
+                yield f.result()
+
+    for res, out in completed():
+        results.append(res)
+        # stop-after 取消掉、還沒開始的題目不逐一列出
+        if stop_after and failures >= stop_after and res["detail"] == NOT_STARTED:
+            continue
+        name = f"{res['lab']}/{res['problem']}" if res["problem"] else res["lab"]
+        if res["skipped"]:
+            note = " (unchanged)"
+        else:
+            note = f" rc={res['returncode']} " + ("(cached)" if res["cached"] else f"{res['duration']:.1f}s")
+        print(f"{res['status']:<9} {name}{note}" + (f"  {res['detail']}" if res["detail"] else ""), flush=True)
+        if res["in_place"]:
+            print(f"          ran in place: {res['in_place']}", flush=True)
+        if res["diverged"]:
+            print("          " + format_divergence(res["diverged"]), flush=True)
+        if res.get("wave"):
+            sys.stdout.write("          " + format_report(res["wave"]).replace("\n", "\n          ").rstrip() + "\n")
+        if verbose and out:
+            sys.stdout.write(format_output_block(res["problem"] or res["lab"], out))
+        if stop_after and counts_as_failure(res):
+            failures += 1
+            if failures == stop_after:
+                print(f"[playV] {failures} failure(s), cancelling the remaining problems (--stop-after)", flush=True)
+                runner.cancel()
+                if coordinator:
+                    coordinator.cancel()
+    return results
+
+def print_timing(labs_root, top):
+    print(f"{'last':>8} {'mean':>8} {'best':>8} {'first':>8} {'trend':>6} runs  problem")
+    for r in summarize_history(load_history(labs_root), top):
+        trend = "" if r["trend"] is None else f"{r['trend']:+.0%}"
+        name = pathlib.Path(r["path"]).relative_to(labs_root)
+        print(f"{format_duration(r['last']):>8} {format_duration(r['mean']):>8} {format_duration(r['best']):>8} "
+              f"{format_duration(r['first_output']):>8} {trend:>6} {r['runs']:>4}  {name}")
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    labs_root = (args.root or labs_root_from_env()).expanduser()
+    if not labs_root.is_dir():
+        print(f"LABSROOT is not a directory: {labs_root}", file=sys.stderr)
+        return 2
+    if args.timing is not None:
+        print_timing(labs_root, args.timing)
+        return 0
+    runner = Runner()
+    coordinator = None
+    if args.dist or args.local_workers:
+        authkey = authkey_from_env()
+        if args.dist and not authkey:
+            print("--dist needs PLAYV_DIST_KEY (the workers use the same key)", file=sys.stderr)
+            return 2
+        address = parse_address(args.dist) if args.dist else ("127.0.0.1", 0)
+        coordinator = Coordinator(address, authkey, args.local_workers)
+        print(f"coordinator listening on {coordinator.address[0] or '*'}:{coordinator.address[1]}", file=sys.stderr)
+
+    def interrupt(*_):
+        runner.cancel()
+        if coordinator:
+            coordinator.cancel()
+
+    signal.signal(signal.SIGINT, interrupt)
+    start = time.monotonic()
+    try:
+        results = run_batch(labs_root, args.jobs, args.incremental, args.verbose, runner, args.compare,
+                            args.golden_check, args.fail_fast, artifact_cache(args.cache),
+                            Scratch(args.scratch) if args.scratch else None, coordinator, args.schedule,
+                            args.stop_after)
+    finally:
+        if coordinator:
+            coordinator.close()
+    summary = {}
+    for res in results:
+        summary[res["status"]] = summary.get(res["status"], 0) + 1
+    print(f"{len(results)} problem(s) in {time.monotonic() - start:.1f}s: "
+          + ", ".join(f"{k} {v}" for k, v in sorted(summary.items())))
+    if args.json:
+        results.sort(key=lambda r: (r["lab"], r["problem"]))
+        args.json.write_text(json.dumps({"root": str(labs_root), "summary": summary, "problems": results}, indent=2))
+    return 0 if results and all(r["status"] == "PASS" for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# 在產生的 labs 上量 playV 的效能: core (discovery, read_all_results, simulate_problem, Runner)
+# 與 gui (啟動, Refresh Status, Simulation All, terminal 輸出, main loop 延遲), 結果寫成 JSON
+# gui 部分在子 process 跑, 沒有 $DISPLAY 時用 xvfb-run, 沒有就跳過; --baseline 與上次的結果比較
+import os, sys, json, time, shutil, argparse, importlib.util, pathlib, platform, statistics, subprocess, tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from playV_core import DEFAULT_JOBS, Runner, discover, iter_problems, read_all_results, simulate_problem
+
+STALL_TICK_MS = 10
+STALL_THRESHOLD = 0.05
+
+MAKEFILE = """\
+test:
+\t@echo "compiling $(notdir $(CURDIR))"
+\t@echo "##SEC_STUDENT_CAN_SEE"
+\t@seq 1 {lines} | sed 's/^/[$(notdir $(CURDIR))] cycle /'
+\t@echo "##END_STUDENT_CAN_SEE"
+\t@mkdir -p sim_result
+\t@echo {result} > sim_result/result.txt
+
+clean:
+\trm -rf sim_result
+"""
+
+def make_labs(root, labs, problems, lines, fail_every=0):
+    # root/labNN/pNN/{Makefile, design_src/top.v}; 回傳題目數
+    root = pathlib.Path(root)
+    n = 0
+    for i in range(labs):
+        for j in range(problems):
+            d = root / f"lab{i:02d}" / f"p{j:02d}"
+            (d / "design_src").mkdir(parents=True, exist_ok=True)
+            n += 1
+            result = "fail" if fail_every and n % fail_every == 0 else "pass"
+            (d / "Makefile").write_text(MAKEFILE.format(lines=lines, result=result))
+            (d / "design_src" / "top.v").write_text(f"module top_{i}_{j}(input a, output y);\n  assign y = a;\nendmodule\n")
+    return n
+
+def _timed(fn, repeat=1):
+    # 回傳 (最快一次的秒數, 最後一次的回傳值)
+    best, value = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        value = fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, value
+
+def bench_core(root, jobs, repeat):
+    out = {}
+    runner = Runner()
+    out["discover_s"], (subdirs, child_map) = _timed(lambda: discover(root), repeat)
+    problems = list(iter_problems(subdirs, child_map))
+    out["problems"] = len(problems)
+    out["read_all_results_s"], _ = _timed(lambda: read_all_results(subdirs, child_map), repeat)
+
+    def run_all():
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            return list(pool.map(lambda job: simulate_problem(runner, job[2], on_line=lambda _: None, record=False),
+                                 problems))
+    dt, results = _timed(run_all)
+    lines = sum(r["output_lines"] for r in results)
+    out["test_all_s"] = dt
+    out["test_all_problems_per_s"] = len(problems) / dt if dt else None
+    out["test_all_lines_per_s"] = lines / dt if dt else None
+    out["test_all_fail"] = sum(r["status"] != "PASS" for r in results)
+    return out
+
+def bench_runner(dirpath):
+    count = [0]
+    def on_line(_):
+        count[0] += 1
+    dt, _ = _timed(lambda: Runner().run(["make", "-s", "test"], cwd=dirpath, on_line=on_line))
+    return {"runner_lines": count[0], "runner_lines_per_s": count[0] / dt if dt else None}
+
+def _stats(samples):
+    if not samples:
+        return {"count": 0}
+    s = sorted(samples)
+    return {"count": len(s), "p50": s[len(s) // 2], "p99": s[min(len(s) - 1, int(len(s) * 0.99))], "max": s[-1],
+            "mean": statistics.fmean(s)}
+
+def gui_child(args):
+    # 在子 process 裡跑: LABSROOT / XDG_CACHE_HOME 已由 bench_gui 設好
+    import threading
+    import playV as gui
+    from gi.repository import GLib
+
+    result = {}
+    stalls = []
+
+    class BenchApp(gui.playV):
+        def do_activate(self):
+            self.t_activate = time.perf_counter()
+            gui.playV.do_activate(self)
+            self.last_tick = time.perf_counter()
+            GLib.timeout_add(STALL_TICK_MS, self._tick)
+            # 包一層量 _refresh_store_and_status (在 main loop 上跑) 的時間
+            orig = self._refresh_store_and_status
+            self.refresh_times = []
+            def timed_refresh(*a, **kw):
+                t0 = time.perf_counter()
+                try:
+                    return orig(*a, **kw)
+                finally:
+                    self.refresh_times.append(time.perf_counter() - t0)
+            self._refresh_store_and_status = timed_refresh
+            threading.Thread(target=self._scenario, daemon=True).start()
+
+        def _tick(self):
+            now = time.perf_counter()
+            stalls.append(max(0.0, now - self.last_tick - STALL_TICK_MS / 1000))
+            self.last_tick = now
+            return True
+
+        def _call(self, fn, *a):
+            # 在 main loop 上呼叫 fn 並等它回傳
+            done = threading.Event()
+            box = []
+            def run():
+                box.append(fn(*a))
+                done.set()
+                return False
+            GLib.idle_add(run)
+            done.wait()
+            return box[0]
+
+        def _wait_idle(self, poll=0.02):
+            while self._busy or self._startup:
+                time.sleep(poll)
+            # 等 pump 清空, 狀態寫進 store
+            while self._call(lambda: len(self.pump.pending) or len(self._pending_status)):
+                time.sleep(poll)
+
+        def _scenario(self):
+            try:
+                self._wait_idle()
+                result["startup_s"] = time.perf_counter() - self.t_activate
+                result["rows"] = self._call(lambda: len(self.store))
+
+                t0 = time.perf_counter()
+                self._call(self.on_refresh_status_clicked)
+                self._wait_idle()
+                result["refresh_all_status_s"] = time.perf_counter() - t0
+
+                self.jobs = args.jobs
+                self.force_all = True
+                t0 = time.perf_counter()
+                self._call(self.on_test_all_clicked)
+                self._wait_idle()
+                dt = time.perf_counter() - t0
+                result["test_all_s"] = dt
+                result["test_all_problems_per_s"] = result["rows"] / dt if dt else None
+
+                # _run_and_log -> pump -> _filter_output -> append_to_terminal, 等畫面都收完才停錶
+                big = pathlib.Path(args.root) / "stream"
+                self.pump.take_stats()
+                t0 = time.perf_counter()
+                self._run_and_log(["make", "-s", "test"], cwd=big)
+                self._wait_idle()
+                dt = time.perf_counter() - t0
+                lines, frames, dropped = self._call(self.pump.take_stats)
+                result["run_and_log_lines"] = lines
+                result["run_and_log_lines_per_s"] = lines / dt if dt else None
+                result["run_and_log_frames"] = frames
+                result["run_and_log_dropped"] = dropped
+
+                # gui_sync_output (TeeStream 的路徑) 每行的成本, 直接在 main loop 上呼叫
+                n = args.stream_lines
+                def direct():
+                    t = time.perf_counter()
+                    self.gui_sync_output("##SEC_STUDENT_CAN_SEE\n")
+                    for i in range(n):
+                        self.gui_sync_output(f"cycle {i}\n")
+                    self.gui_sync_output("##END_STUDENT_CAN_SEE\n")
+                    return time.perf_counter() - t
+                dt = self._call(direct)
+                result["gui_sync_output_lines_per_s"] = n / dt if dt else None
+                result["refresh_store_and_status_s"] = _stats(self.refresh_times)
+            except Exception as e:
+                result["error"] = repr(e)
+            finally:
+                GLib.idle_add(self.quit)
+
+    app = BenchApp()
+    app.run([])
+    result["stall_s"] = _stats(stalls)
+    result["stalls_over_threshold"] = sum(s > STALL_THRESHOLD for s in stalls)
+    pathlib.Path(args.gui_child).write_text(json.dumps(result))
+    return 0
+
+def bench_gui(args):
+    if importlib.util.find_spec("gi") is None:
+        return {"skipped": "PyGObject is not installed"}
+    cmd = [sys.executable, os.path.abspath(__file__), "--gui-child", "", "--root", str(args.root),
+           "--jobs", str(args.jobs), "--stream-lines", str(args.stream_lines)]
+    if not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY"):
+        if not shutil.which("xvfb-run"):
+            return {"skipped": "no display and xvfb-run not found"}
+        cmd = ["xvfb-run", "-a"] + cmd
+    with tempfile.TemporaryDirectory(prefix="playV-bench-") as tmp:
+        out = pathlib.Path(tmp) / "gui.json"
+        cmd[cmd.index("--gui-child") + 1] = str(out)
+        env = dict(os.environ, LABSROOT=str(args.root / "labs"), XDG_CACHE_HOME=tmp, PLAYV_WATCH="off")
+        env.pop("PLAYV_ROOTS", None)
+        try:
+            proc = subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                                  timeout=args.timeout)
+        except subprocess.TimeoutExpired:
+            return {"error": f"timed out after {args.timeout}s"}
+        if not out.is_file():
+            return {"error": f"exit {proc.returncode}: {proc.stderr.strip()[-2000:]}"}
+        return json.loads(out.read_text())
+
+def _flatten(d, prefix=""):
+    for k, v in d.items():
+        if isinstance(v, dict):
+            yield from _flatten(v, f"{prefix}{k}.")
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield f"{prefix}{k}", v
+
+def compare(base, new):
+    # 每個數字: baseline, 這次, 比例 (名稱有 per_s 的越大越好, 其他越小越好)
+    if base.get("params") != new.get("params"):
+        print(f"  (parameters differ: {base.get('params')} vs {new.get('params')})")
+    sections = lambda r: {k: r.get(k, {}) for k in ("core", "gui")}
+    old = dict(_flatten(sections(base)))
+    for key, value in _flatten(sections(new)):
+        if key in old and old[key]:
+            ratio = value / old[key]
+            better = ratio > 1 if "per_s" in key else ratio < 1
+            mark = "+" if better else "-" if ratio != 1 else " "
+            print(f"  {key:45s} {old[key]:12.4g} -> {value:12.4g}  x{ratio:.2f} {mark}")
+
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Benchmark playV on a synthetic labs tree.")
+    ap.add_argument("--labs", type=int, default=10)
+    ap.add_argument("--problems", type=int, default=10, help="problems per lab")
+    ap.add_argument("--lines", type=int, default=200, help="visible output lines per problem")
+    ap.add_argument("--stream-lines", type=int, default=100000, help="lines for the single-problem stream test")
+    ap.add_argument("--fail-every", type=int, default=7, help="every N-th problem fails (0: none)")
+    ap.add_argument("--jobs", "-j", type=int, default=DEFAULT_JOBS)
+    ap.add_argument("--repeat", type=int, default=3, help="runs of the cheap benchmarks (best is kept)")
+    ap.add_argument("--root", type=pathlib.Path, help="where to generate the tree (default: a temp dir)")
+    ap.add_argument("--keep", action="store_true", help="keep the generated tree")
+    ap.add_argument("--no-gui", action="store_true", help="only the Gtk-free benchmarks")
+    ap.add_argument("--timeout", type=float, default=1800, help="seconds before the GUI run is abandoned")
+    ap.add_argument("--json", type=pathlib.Path, help="write results to this file")
+    ap.add_argument("--baseline", type=pathlib.Path, help="compare with an earlier --json file")
+    ap.add_argument("--gui-child", help=argparse.SUPPRESS)
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.gui_child:
+        return gui_child(args)
+    # 自己建的暫存目錄跑完就刪; --root 給的目錄不刪
+    args.root_given = args.root is not None
+    args.root = (args.root or pathlib.Path(tempfile.mkdtemp(prefix="playV-bench-"))).resolve()
+    try:
+        n = make_labs(args.root / "labs", args.labs, args.problems, args.lines, args.fail_every)
+        stream = args.root / "stream"
+        stream.mkdir(parents=True, exist_ok=True)
+        (stream / "Makefile").write_text(MAKEFILE.format(lines=args.stream_lines, result="pass"))
+        print(f"[bench] {n} problem(s) under {args.root / 'labs'}, jobs={args.jobs}", file=sys.stderr)
+        results = {
+            "params": {k: v for k, v in vars(args).items() if k in ("labs", "problems", "lines", "stream_lines",
+                                                                       "fail_every", "jobs", "repeat")},
+            "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        results["core"] = bench_core(args.root / "labs", args.jobs, args.repeat)
+        results["core"].update(bench_runner(stream))
+        results["gui"] = {"skipped": "--no-gui"} if args.no_gui else bench_gui(args)
+    finally:
+        if not args.keep and not args.root_given:
+            shutil.rmtree(args.root, ignore_errors=True)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.json:
+        args.json.write_text(text + "\n")
+    if args.baseline:
+        print(f"[bench] compared with {args.baseline}:")
+        compare(json.loads(args.baseline.read_text()), results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,838 @@
+# playV.py 與 playV_batch.py 共用的部分: lab 掃描, make runner, 結果與各種快取; 不能 import gi
+import os, re, sys, glob, json, math, stat, time, shutil, signal, hashlib, pathlib, resource, contextlib
+import subprocess, threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_LABSROOT = "/home/verilog/Desktop/dlab/public/labs/"
+
+DSRC_DIR = "design_src"
+SSRC_DIR = "sim_src"
+SRES_DIR = "sim_result"
+GOLDEN_DIR = "golden"
+# make 找 makefile 的順序
+MAKEFILE_NAMES = ("GNUmakefile", "makefile", "Makefile")
+
+CACHE_DIR = pathlib.Path(os.environ.get("XDG_CACHE_HOME") or "~/.cache").expanduser() / "playV"
+
+# 每題模擬的時間 (秒) 與輸出量 (bytes) 上限, 超過就砍整個 process group
+SIM_TIMEOUT = float(os.environ.get("PLAYV_TIMEOUT", "300"))
+SIM_MAX_OUTPUT = int(os.environ.get("PLAYV_MAX_OUTPUT", str(64 * 1024 * 1024)))
+
+# 每題模擬的記憶體 (address space) 與單一檔案大小上限 (MB, 0 為不限), 由 sh 的 ulimit 設定
+SIM_MAX_MEMORY_MB = float(os.environ.get("PLAYV_MAX_MEMORY_MB", "8192"))
+SIM_MAX_FILE_MB = float(os.environ.get("PLAYV_MAX_FILE_MB", "4096"))
+
+# 模擬的 CPU / IO 優先權: nice 值與 ionice 的 class[:level] ("2:7" best-effort 最低, "3" idle, 空字串不改)
+SIM_NICE = int(os.environ.get("PLAYV_NICE", "5"))
+SIM_IONICE = os.environ.get("PLAYV_IONICE", "2:7")
+
+# Simulation All 平行度 (預設 CPU 數)
+DEFAULT_JOBS = int(os.environ.get("PLAYV_JOBS", "0") or 0) or os.cpu_count() or 1
+
+# 依負載調整 Simulation All 同時跑幾題 (見 Throttle); 可用記憶體至少留 MIN_FREE_MB, 每題估 JOB_MEMORY_MB
+ADAPTIVE_JOBS = os.environ.get("PLAYV_ADAPTIVE", "1") not in ("", "0")
+MIN_FREE_MB = float(os.environ.get("PLAYV_MIN_FREE_MB", "1024"))
+JOB_MEMORY_MB = float(os.environ.get("PLAYV_JOB_MEMORY_MB", "512"))
+THROTTLE_POLL = 1.0
+
+# 讀 result.txt 的 thread 數 (I/O bound, NFS 上延遲大)
+READ_WORKERS = 16
+
+# on_line 回傳 STOP 時 Runner 提早砍掉這次執行 (killed 為 "STOPPED")
+STOP = "STOP"
+
+# 邊跑邊和 golden_log.txt 比對 / 第一個不一致就停 (GUI 的勾選框預設值)
+GOLDEN_CHECK = os.environ.get("PLAYV_GOLDEN_CHECK", "") not in ("", "0")
+FAIL_FAST = os.environ.get("PLAYV_FAIL_FAST", "") not in ("", "0")
+
+def labs_root_from_env():
+    return pathlib.Path(os.environ.get("LABSROOT") or DEFAULT_LABSROOT).expanduser()
+
+def labs_roots_from_env():
+    # 回傳 [(student, labs_root)]; PLAYV_ROOTS 沒設時只有 LABSROOT, student 為 ""
+    # PLAYV_ROOTS 以 os.pathsep 分隔, 每項是路徑 (可用 glob) 或 name=路徑
+    spec = os.environ.get("PLAYV_ROOTS", "")
+    if not spec:
+        return [("", labs_root_from_env())]
+    entries = []
+    for item in spec.split(os.pathsep):
+        name, sep, path = item.partition("=")
+        if not sep:
+            name, path = "", item
+        path = os.path.expanduser(path)
+        if not path:
+            continue
+        paths = sorted(glob.glob(path)) if any(c in path for c in "*?[") else [path]
+        entries += [(name, pathlib.Path(p)) for p in paths]
+    # 沒給名字時用目錄名, 重複時 (例如都叫 labs) 改用上一層的目錄名
+    basenames = [p.name for _, p in entries]
+    roots, used = [], set()
+    for name, path in entries:
+        name = name or (path.name if basenames.count(path.name) == 1 else path.parent.name)
+        unique, n = name, 1
+        while unique in used:
+            n += 1
+            unique = f"{name}#{n}"
+        used.add(unique)
+        roots.append((unique, path))
+    return roots
+
+def read_result(dirpath, missing="FAIL"):
+    try:
+        txt = (pathlib.Path(dirpath) / SRES_DIR / "result.txt").read_text().strip().lower()
+        return "PASS" if txt == "pass" else "FAIL"
+    except Exception:
+        return missing
+
+def list_dirs(path):
+    # scandir 的 is_dir() 直接用 readdir 的 d_type, 一般目錄不必每個再 stat 一次
+    path = pathlib.Path(path)
+    with os.scandir(path) as it:
+        return sorted(path / e.name for e in it if not e.name.startswith('.') and e.is_dir())
+
+def _list_children(lab):
+    try:
+        return list_dirs(lab)
+    except OSError as e:
+        print(f"[Warning] Failed to read subdirectories of {lab}: {e}", file=sys.stderr)
+        return []
+
+def iter_discover(labs_root):
+    # 依序產生 (lab, children); 各 lab 的目錄平行讀, 適合 NFS
+    subdirs = list_dirs(labs_root)
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as pool:
+        yield from zip(subdirs, pool.map(_list_children, subdirs))
+
+def discover(labs_root):
+    # 回傳 (subdirs, child_map), 讀不到的 lab 當作沒有題目
+    child_map = dict(iter_discover(labs_root))
+    return list(child_map), child_map
+
+def iter_problems(subdirs, child_map):
+    # 產生 (lab, prob, dirpath); 沒有題目的 lab 本身當一題, prob 為 ""
+    for lab in subdirs:
+        for prob in child_map.get(lab) or [None]:
+            if prob:
+                yield lab.name, prob.name, prob
+            else:
+                yield lab.name, "", lab
+
+def read_all_results(subdirs, child_map, known=None):
+    # 回傳 [(lab, prob, status, mtime_ns)], 依 subdirs/child_map 排序
+    # known: {(lab, prob): (status, mtime_ns)}, mtime 沒變就不重讀 result.txt
+    known = known or {}
+    keys = list(iter_problems(subdirs, child_map))
+
+    def read_one(key):
+        try:
+            mtime = (key[2] / SRES_DIR / "result.txt").stat().st_mtime_ns
+        except OSError:
+            return "NULL", None
+        hit = known.get(key[:2])
+        if hit and hit[1] == mtime:
+            return hit
+        return read_result(key[2], missing="NULL"), mtime
+
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as pool:
+        results = list(pool.map(read_one, keys))
+    return [(lab, prob, status, mtime) for (lab, prob, _), (status, mtime) in zip(keys, results)]
+
+def format_output_block(prob_name, lines):
+    # 只留 ##SEC_STUDENT_CAN_SEE ~ ##END_STUDENT_CAN_SEE 之間的輸出, 前面加題目名稱
+    chunks = []
+    visible = False
+    for line in lines:
+        if "##SEC_STUDENT_CAN_SEE" in line:
+            visible = True
+            chunks.append(f"【{prob_name or '(unnamed)'}】\n")
+        elif "##END_STUDENT_CAN_SEE" in line:
+            visible = False
+        elif visible:
+            chunks.append(line if line.endswith("\n") else line + "\n")
+    return "".join(chunks)
+
+# 啟動時先用上次的 score board, 再在背景重新確認
+STATUS_CACHE_VERSION = 1
+
+def status_cache_path(labs_root):
+    key = hashlib.sha1(str(labs_root).encode()).hexdigest()[:16]
+    return CACHE_DIR / f"status-{key}.json"
+
+def load_status_cache(labs_root):
+    try:
+        data = json.loads(status_cache_path(labs_root).read_text())
+        if data.get("version") != STATUS_CACHE_VERSION or data.get("root") != str(labs_root):
+            return None
+        subdirs = [labs_root / lab for lab in data["labs"]]
+        child_map = {labs_root / lab: [labs_root / lab / p for p in probs] for lab, probs in data["labs"].items()}
+        rows = [tuple(r) for r in data["rows"]]
+    except Exception:
+        return None
+    return subdirs, child_map, rows
+
+def save_status_cache(labs_root, subdirs, child_map, rows):
+    path = status_cache_path(labs_root)
+    data = {
+        "version": STATUS_CACHE_VERSION,
+        "root": str(labs_root),
+        "labs": {lab.name: [p.name for p in child_map.get(lab) or []] for lab in subdirs},
+        "rows": [list(r) for r in rows],
+    }
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[Warning] Failed to write status cache {path}: {e}", file=sys.stderr)
+
+# 增量模擬: 記錄上次 make test 時的輸入指紋 (檔名+大小+mtime)
+MANIFEST_NAME = ".playv_manifest.json"
+
+def input_fingerprint(dirpath):
+    d = pathlib.Path(dirpath)
+    files = [d / "Makefile"]
+    for sub in (DSRC_DIR, SSRC_DIR, GOLDEN_DIR):
+        files += sorted((d / sub).rglob("*"))
+    h = hashlib.sha1()
+    for f in files:
+        try:
+            st = f.stat()
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode):
+            h.update(f"{f.relative_to(d)}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+def cached_status(dirpath, fingerprint):
+    # 輸入沒變且 result.txt 仍與紀錄一致才沿用
+    try:
+        m = json.loads((pathlib.Path(dirpath) / SRES_DIR / MANIFEST_NAME).read_text())
+    except Exception:
+        return None
+    if m.get("fingerprint") != fingerprint:
+        return None
+    status = read_result(dirpath, missing=None)
+    return status if status == m.get("status") else None
+
+def write_manifest(dirpath, fingerprint, status):
+    sres = pathlib.Path(dirpath) / SRES_DIR
+    try:
+        if sres.is_dir():
+            (sres / MANIFEST_NAME).write_text(json.dumps({"fingerprint": fingerprint, "status": status}))
+    except OSError as e:
+        print(f"[Warning] Failed to write manifest in {sres}: {e}", file=sys.stderr)
+
+# Makefile 用到的題目目錄外的檔案, 依 (Makefile, mtime, size) 快取; scratch / dist / artifact cache 共用
+_outside = {}
+# make -n -p 裡出現的這些路徑底下是工具 / 系統檔案, 不算題目的輸入
+SYSTEM_PREFIXES = ("/usr/", "/bin/", "/sbin/", "/lib", "/opt/", "/etc/", "/dev/", "/proc/", "/sys/", "/tmp/")
+_PATH_TOKEN = re.compile(r"""(?:^|[\s=+,:;()'"]|-[A-Za-z])(\.\.?/[^\s=+,:;()'"]*|/[^\s=+,:;()'"]+)""")
+
+def outside_inputs(dirpath):
+    # 回傳 make test 用到的題目目錄外的檔案 / 目錄 (../common/tb.v 等); 沒有 Makefile 或 make 跑不起來時回傳 None
+    d = pathlib.Path(dirpath).resolve()
+    for name in MAKEFILE_NAMES:
+        try:
+            st = os.stat(d / name)
+            break
+        except FileNotFoundError:
+            continue
+    else:
+        return None
+    key = (str(d / name), st.st_mtime_ns, st.st_size)
+    if key in _outside:
+        return _outside[key]
+    try:
+        out = subprocess.run(["make", "-n", "-p", "test"], cwd=d, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                             stdin=subprocess.DEVNULL, text=True, errors="replace", timeout=30,
+                             env=dict(os.environ, LC_ALL="C")).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"[Warning] make -n -p test failed in {d}: {e}", file=sys.stderr)
+        return None
+    # 只看 dry-run 印出的指令與 "# Files" 段的規則, 環境變數 (PATH, HOME...) 不算
+    commands, _, database = out.partition("\n# Make data base")
+    files = database.partition("\n# Files\n")[2].partition("\n# files hash-table stats")[0]
+    paths = set()
+    for token in _PATH_TOKEN.findall(commands + "\n" + files):
+        if token.startswith(SYSTEM_PREFIXES):
+            continue
+        path = pathlib.Path(os.path.normpath(d / token))
+        # 題目目錄裡面的不算; 包含題目目錄的上層 (-I..) 也不算
+        if path == d or d in path.parents or path in d.parents or not path.exists():
+            continue
+        paths.add(path)
+    _outside[key] = sorted(paths)
+    return _outside[key]
+
+def outside_reason(dirpath):
+    # outside_inputs 有東西時回傳給使用者看的說明, 否則 None
+    outside = outside_inputs(dirpath)
+    if not outside:
+        return None
+    names = ", ".join(os.path.relpath(p, dirpath) for p in outside[:3]) + (", ..." if len(outside) > 3 else "")
+    return f"Makefile uses files outside the problem directory ({names})"
+
+# Simulation All 的執行順序 (smart | alpha, 見 schedule_problems) 與失敗幾題就停 (0: 不停)
+SCHEDULE = os.environ.get("PLAYV_SCHEDULE", "smart")
+STOP_AFTER = int(os.environ.get("PLAYV_STOP_AFTER", "0") or 0)
+
+# 還沒開始就被取消的題目 (Cancel / 失敗太多停下來), simulate_problem 與 playV_dist 都用這個 detail
+NOT_STARTED = "cancelled"
+
+def counts_as_failure(res):
+    # stop-after 用: 真的跑了而且沒過
+    return res["status"] not in ("PASS", "CANCELLED") and not res["skipped"]
+
+# 被 playV 砍掉的狀態, 不是 make test 自己的 PASS/FAIL; RESOURCE 為超過記憶體 / 檔案大小 / 輸出量上限
+KILLED_STATUSES = ("TIMEOUT", "CANCELLED", "RESOURCE")
+
+# 有設 rlimit 時, make test 失敗且輸出裡有這些字樣就算 RESOURCE (153 = 128 + SIGXFSZ)
+RESOURCE_HINT = re.compile(r"File size limit exceeded|std::bad_alloc|Cannot allocate memory|[Oo]ut of memory|"
+                           r"memory exhausted|MemoryError|\] Error 153\b")
+
+def kill_group(p, grace=2.0):
+    # 先 SIGTERM, grace 秒後還在就 SIGKILL
+    try:
+        os.killpg(p.pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return
+    try:
+        p.wait(grace)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(p.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+def _limit_prefix(rlimits, nice, ionice):
+    # 放在指令前面的 sh -c 'ulimit ...; exec "$@"' / nice / ionice; make 的子孫都繼承
+    # 不用 preexec_fn: 在多 thread 的 process 裡不安全, 也會讓 subprocess 不能用 vfork
+    prefix = []
+    if rlimits:
+        cmds = []
+        for res, flag, unit, value in rlimits:
+            hard = resource.getrlimit(res)[1]
+            if hard != resource.RLIM_INFINITY:
+                value = min(value, hard)
+            cmds.append(f"ulimit -S -{flag} {value // unit}")
+        prefix += ["sh", "-c", "; ".join(cmds) + '; exec "$@"', "sh"]
+    if nice:
+        prefix += ["nice", "-n", str(nice)]
+    cls, _, level = ionice.partition(":")
+    if cls and shutil.which("ionice"):
+        # -t: 設不了 (權限, 不支援的 scheduler) 就照樣跑
+        prefix += ["ionice", "-t", "-c", cls] + (["-n", level] if level else [])
+    return prefix
+
+class Runner:
+    # 逐行讀指令輸出; limits 時在自己的 session 裡跑, 套用 rlimit 與 nice / ionice, 逾時或取消時整個 process group 砍掉
+    # 一個 batch 的所有 worker thread 共用一個 Runner
+    def __init__(self, timeout=SIM_TIMEOUT, max_output=SIM_MAX_OUTPUT, low_priority=False,
+                 max_memory_mb=SIM_MAX_MEMORY_MB, max_file_mb=SIM_MAX_FILE_MB, nice=SIM_NICE, ionice=SIM_IONICE):
+        self.timeout = timeout
+        self.max_output = max_output
+        self.low_priority = low_priority
+        self.max_file_mb = max_file_mb
+        # (resource, ulimit 的選項, 單位 bytes, 上限 bytes); sh 的 ulimit -f 以 512 bytes 為單位
+        rlimits = []
+        if max_memory_mb > 0:
+            rlimits.append((resource.RLIMIT_AS, "v", 1024, int(max_memory_mb * 1024 * 1024)))
+        if max_file_mb > 0:
+            rlimits.append((resource.RLIMIT_FSIZE, "f", 512, int(max_file_mb * 1024 * 1024)))
+        self.rlimits = rlimits
+        if low_priority:
+            self.prefix = _limit_prefix(rlimits, 19, "3")
+        else:
+            self.prefix = _limit_prefix(rlimits, nice, ionice)
+        self.cancel_event = threading.Event()
+        self.procs = {}
+        self.lock = threading.Lock()
+
+    def run(self, cmd, cwd=None, on_line=None, limits=True):
+        # 回傳 (returncode, killed, why), killed 為 None / "TIMEOUT" / "CANCELLED" / "STOPPED" / "RESOURCE"
+        # 無法啟動時丟出 OSError
+        killed = []
+        timer = None
+        hint = None
+        # 模擬器可能印出非 UTF-8 的 byte ($display("%c", ...)), 換成 U+FFFD 而不是丟出 UnicodeDecodeError
+        p = subprocess.Popen(self.prefix + cmd if limits else cmd, cwd=cwd, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT, text=True, errors="replace", bufsize=1, start_new_session=limits)
+        try:
+            if limits:
+                with self.lock:
+                    self.procs[p] = killed
+                if self.cancel_event.is_set():
+                    self._kill(p, killed, "CANCELLED", "cancelled")
+                timer = threading.Timer(self.timeout, self._kill, (p, killed, "TIMEOUT", f"> {self.timeout:g} s"))
+                timer.daemon = True
+                timer.start()
+            size = 0
+            for line in iter(p.stdout.readline, ''):
+                size += len(line)
+                if limits and size > self.max_output:
+                    # 多的輸出直接丟掉, 等 process group 被砍
+                    if not killed:
+                        threading.Thread(target=self._kill, args=(p, killed, "RESOURCE", f"> {self.max_output} bytes of output"),
+                                         daemon=True).start()
+                    continue
+                if limits and self.rlimits and hint is None and RESOURCE_HINT.search(line):
+                    hint = line.strip()
+                if on_line and on_line(line) == STOP and not killed:
+                    threading.Thread(target=self._kill, args=(p, killed, "STOPPED", "stopped early"), daemon=True).start()
+            p.stdout.close()
+            rc = p.wait()
+        except BaseException:
+            # 讀輸出或 on_line 出錯: 先把 make 砍掉再往上丟, 不留下沒人讀的 process
+            if limits:
+                kill_group(p)
+            else:
+                p.kill()
+            p.wait()
+            raise
+        finally:
+            if timer:
+                timer.cancel()
+            if limits:
+                with self.lock:
+                    self.procs.pop(p, None)
+        if killed:
+            return rc, killed[0][0], killed[0][1]
+        if limits and self.rlimits and rc != 0:
+            if rc == -signal.SIGXFSZ:
+                return rc, "RESOURCE", f"file size limit ({self.max_file_mb:g} MB)"
+            if hint:
+                return rc, "RESOURCE", f"resource limit: {hint[:200]}"
+        return rc, None, None
+
+    def _kill(self, p, killed, status, why):
+        if p.poll() is not None or killed:
+            return
+        killed.append((status, why))
+        kill_group(p)
+
+    def cancel(self):
+        self.cancel_event.set()
+        with self.lock:
+            procs = list(self.procs.items())
+        for p, killed in procs:
+            threading.Thread(target=self._kill, args=(p, killed, "CANCELLED", "cancelled"), daemon=True).start()
+
+def mem_available_mb():
+    # /proc/meminfo 的 MemAvailable; 讀不到時回傳 None
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+class _OwnLoad:
+    # 本 process 的模擬對 1 分鐘 load average 的貢獻
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.value = 0.0
+        self.stamp = time.monotonic()
+
+    def _decay(self):
+        # 與 kernel 一樣的指數平均 (時間常數 60 秒); 上一輪 Simulation All 留下的 load 也扣得掉
+        now = time.monotonic()
+        self.value = self.running + (self.value - self.running) * math.exp(-(now - self.stamp) / 60)
+        self.stamp = now
+
+    def add(self, n):
+        with self.lock:
+            self._decay()
+            self.running += n
+
+    def get(self):
+        with self.lock:
+            self._decay()
+            return self.value
+
+_own_load = _OwnLoad()
+
+class Throttle:
+    # 最多同時跑 jobs 題; 別人用掉幾顆 CPU (load average 扣掉自己的) 就少跑幾題,
+    # 可用記憶體不夠也先等; 至少能跑一題, cancel_event 設了就不再等
+    def __init__(self, jobs, cancel_event=None, adaptive=ADAPTIVE_JOBS):
+        self.jobs = max(1, jobs)
+        self.cancel_event = cancel_event
+        self.adaptive = adaptive
+        self.cond = threading.Condition()
+        self.running = 0
+        self.peak = 0
+        self.waits = 0
+
+    def _may_start(self):
+        if self.running >= self.jobs:
+            return False
+        if not self.adaptive or self.running == 0:
+            return True
+        try:
+            others = max(0.0, os.getloadavg()[0] - _own_load.get())
+        except OSError:
+            others = 0.0
+        # 別人用掉幾顆 CPU 就少跑幾題
+        if self.running >= max(1, self.jobs - int(others)):
+            return False
+        avail = mem_available_mb()
+        return avail is None or avail - JOB_MEMORY_MB >= MIN_FREE_MB
+
+    @contextlib.contextmanager
+    def slot(self):
+        with self.cond:
+            waited = False
+            while not self._may_start() and not (self.cancel_event and self.cancel_event.is_set()):
+                waited = True
+                self.cond.wait(THROTTLE_POLL)
+            self.waits += waited
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        _own_load.add(1)
+        try:
+            yield
+        finally:
+            _own_load.add(-1)
+            with self.cond:
+                self.running -= 1
+                self.cond.notify_all()
+
+class GoldenMatcher:
+    # 邊跑邊和 golden_log.txt 比對 ##SEC_STUDENT_CAN_SEE 之間的行 (忽略行尾空白)
+    # golden_log.txt 沒有標記時用所有非 ## 開頭的行
+    def __init__(self, expected):
+        self.expected = expected
+        self.visible = False
+        self.count = 0
+        self.diverged = None
+
+    @classmethod
+    def load(cls, dirpath):
+        # golden_log.txt 不存在時回傳 None
+        try:
+            lines = (pathlib.Path(dirpath) / GOLDEN_DIR / "golden_log.txt").read_text(errors="replace").splitlines()
+        except OSError:
+            return None
+        if not any("##SEC_STUDENT_CAN_SEE" in line for line in lines):
+            return cls([line.rstrip() for line in lines if not line.lstrip().startswith("##")])
+        matcher = cls([])
+        for line in lines:
+            if matcher._marker(line) or not matcher.visible:
+                continue
+            matcher.expected.append(line.rstrip())
+        matcher.visible = False
+        return matcher
+
+    def _marker(self, line):
+        if "##SEC_STUDENT_CAN_SEE" in line:
+            self.visible = True
+        elif "##END_STUDENT_CAN_SEE" in line:
+            self.visible = False
+        else:
+            return False
+        return True
+
+    def feed(self, line):
+        # 回傳第一個不一致 {line, expected, got}, 其餘情況 (含之後的行) 回傳 None
+        if self._marker(line) or not self.visible or self.diverged:
+            return None
+        got = line.rstrip()
+        expected = self.expected[self.count] if self.count < len(self.expected) else None
+        self.count += 1
+        if got != expected:
+            self.diverged = {"line": self.count, "expected": expected, "got": got}
+            return self.diverged
+        return None
+
+    def finish(self):
+        # 輸出結束時 golden 還有剩的行也算不一致
+        if self.diverged is None and self.count < len(self.expected):
+            self.diverged = {"line": self.count + 1, "expected": self.expected[self.count], "got": None}
+            return self.diverged
+        return None
+
+def format_divergence(d):
+    expected = "<end of output>" if d["expected"] is None else repr(d["expected"])
+    got = "<end of output>" if d["got"] is None else repr(d["got"])
+    return f"differs from golden_log.txt at visible line {d['line']}: expected {expected}, got {got}"
+
+def simulate_problem(runner, dirpath, on_line=None, force=True, record=True, golden_check=False, fail_fast=False,
+                     on_diverge=None, artifacts=None, scratch=None, speculative=None):
+    # 在 dirpath 跑 make test, 回傳 status / returncode / duration / skipped / cached / speculative / detail
+    # / diverged 與輸出統計; force=False 時輸入沒變就跳過, artifacts / scratch / speculative 都可以不給
+    # 給了 scratch 卻只能在原目錄跑時 (Makefile 用到 ../common 等), in_place 是原因
+    result = {"status": "FAIL", "returncode": None, "duration": 0.0, "skipped": False, "cached": False,
+              "speculative": False, "detail": None, "first_output": None, "output_lines": 0, "output_bytes": 0,
+              "diverged": None, "in_place": None}
+    fingerprint = input_fingerprint(dirpath)
+    if not force:
+        status = cached_status(dirpath, fingerprint)
+        if status:
+            result.update(status=status, skipped=True)
+            return result
+    if runner.cancel_event.is_set():
+        result.update(status="CANCELLED", detail=NOT_STARTED)
+        return result
+    matcher = GoldenMatcher.load(dirpath) if golden_check or fail_fast else None
+    key = artifacts.key(dirpath) if artifacts else None
+    log = [] if key else None
+    start = time.monotonic()
+
+    def diverge(d):
+        result["diverged"] = d
+        if on_diverge:
+            on_diverge(d)
+
+    def timed_line(line):
+        result["output_lines"] += 1
+        result["output_bytes"] += len(line)
+        if result["first_output"] is None and "##SEC_STUDENT_CAN_SEE" in line:
+            result["first_output"] = time.monotonic() - start
+        if on_line:
+            on_line(line)
+        if log is not None:
+            log.append(line)
+        if matcher:
+            d = matcher.feed(line)
+            if d:
+                diverge(d)
+                if fail_fast:
+                    return STOP
+        return None
+
+    hit = artifacts.restore(key, dirpath) if key else None
+    if hit:
+        result["cached"] = True
+    elif speculative:
+        hit = speculative.take(dirpath, fingerprint)
+        result["speculative"] = bool(hit)
+    if hit:
+        rc, lines = hit
+        killed = why = None
+        for line in lines:
+            timed_line(line)
+        # 背景跑的結果也存進 artifact cache; cache 命中的就不必再存
+        if result["cached"]:
+            log = None
+    else:
+        cwd = dirpath
+        if scratch:
+            try:
+                cwd = scratch.sync_in(dirpath)
+            except OSError as e:
+                result["in_place"] = f"{e}; not copied to scratch"
+                print(f"[playV] {dirpath}: not using scratch, running in place: {e}", file=sys.stderr)
+        try:
+            rc, killed, why = runner.run(["make", "test"], cwd=cwd, on_line=timed_line)
+        except Exception as e:
+            result.update(duration=time.monotonic() - start, detail=f"make test: {e}")
+            return result
+        if cwd != dirpath:
+            try:
+                scratch.sync_out(dirpath, cwd)
+            except OSError as e:
+                print(f"[Warning] Failed to copy sim_result back to {dirpath}: {e}", file=sys.stderr)
+    result.update(returncode=rc, duration=time.monotonic() - start)
+    if matcher and not killed:
+        d = matcher.finish()
+        if d:
+            diverge(d)
+    if killed == "STOPPED":
+        # 已知答案不對, 不寫 manifest (result.txt 可能是上次留下的)
+        result.update(detail="stopped at the first difference from golden_log.txt (fail-fast)")
+    elif killed:
+        result.update(status=killed, detail=f"{killed} ({why})")
+    else:
+        result["status"] = read_result(dirpath)
+        write_manifest(dirpath, fingerprint, result["status"])
+        if log is not None:
+            artifacts.store(key, dirpath, log, rc)
+    if record and not hit:
+        append_history(dirpath, result)
+    return result
+
+# clean 規則的判斷結果, 依 (Makefile, mtime, size) 快取
+_clean_rules = {}
+_SIMPLE_RM = re.compile(r"(\./)?" + re.escape(SRES_DIR) + r"(/.*)?")
+
+_RULE = re.compile(r"([^:=#\t][^:=#]*?)\s*(::?)(?!=)(.*)")
+
+def _clean_is_simple(text):
+    # 提到 clean 的規則都只有 clean 一個 target, 沒有 prerequisite, 而且每一行都只是 rm sim_result 底下的東西
+    if re.search(r"^\s*-?include\b", text, re.M):
+        return False
+    recipe, in_clean = [], False
+    for line in text.replace("\\\n", " ").splitlines():
+        if line.startswith("\t"):
+            if in_clean:
+                recipe.append(line.strip())
+            continue
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        in_clean = False
+        m = _RULE.match(line)
+        if not m or "clean" not in m.group(1).split():
+            continue
+        # test clean: / clean:: 之類的規則還有別的步驟, 交給 make clean
+        if m.group(1).split() != ["clean"] or m.group(2) == "::":
+            return False
+        deps, _, inline = m.group(3).partition(";")
+        if deps.split("#")[0].strip():
+            return False
+        in_clean = True
+        if inline.strip():
+            recipe.append(inline.strip())
+    for cmd in recipe:
+        cmd = cmd.lstrip("@-+ ")
+        words = cmd.split()
+        if any(c in cmd for c in ";&|$`<>") or not words or words[0] != "rm":
+            return False
+        args = [w for w in words[1:] if not w.startswith("-")]
+        # sim_result/../* 之類會刪到 sim_result 外面
+        if not args or not all(_SIMPLE_RM.fullmatch(a) and ".." not in a.split("/") for a in args):
+            return False
+    return True
+
+def clean_is_simple(dirpath):
+    # make clean 只會刪 sim_result (或根本沒有 makefile) 時為 True
+    for name in MAKEFILE_NAMES:
+        makefile = pathlib.Path(dirpath) / name
+        try:
+            st = makefile.stat()
+        except FileNotFoundError:
+            continue
+        except OSError:
+            return False
+        key = (str(makefile), st.st_mtime_ns, st.st_size)
+        if key not in _clean_rules:
+            try:
+                _clean_rules[key] = _clean_is_simple(makefile.read_text(errors="replace"))
+            except OSError:
+                return False
+        return _clean_rules[key]
+    return True
+
+def reset_problem(runner, dirpath, on_line=None):
+    # 回傳 (status, detail, used_make): status 為 "NULL", 被砍時為 TIMEOUT / CANCELLED / RESOURCE
+    # 只刪 sim_result 的題目直接刪, clean 另有其他步驟的才跑 make clean
+    if runner.cancel_event.is_set():
+        return "CANCELLED", NOT_STARTED, False
+    dirpath = pathlib.Path(dirpath)
+    if clean_is_simple(dirpath):
+        try:
+            shutil.rmtree(dirpath / SRES_DIR)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            return read_result(dirpath, missing="NULL"), f"remove {dirpath / SRES_DIR}: {e}", False
+        return "NULL", None, False
+    try:
+        _, killed, why = runner.run(["make", "clean"], cwd=dirpath, on_line=on_line)
+    except OSError as e:
+        return read_result(dirpath, missing="NULL"), f"make clean: {e}", True
+    if killed:
+        return killed, f"{killed} ({why})", True
+    return "NULL", None, True
+
+# 每次 make test 的耗時紀錄, 一行一筆 JSON, 只會往後加
+HISTORY_PATH = CACHE_DIR / "history.jsonl"
+HISTORY_FIELDS = ("status", "returncode", "duration", "first_output", "output_lines", "output_bytes")
+_history_lock = threading.Lock()
+
+def append_history(dirpath, result):
+    entry = {"time": time.time(), "path": str(dirpath)}
+    entry.update((k, result[k]) for k in HISTORY_FIELDS)
+    try:
+        with _history_lock:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(HISTORY_PATH, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        print(f"[Warning] Failed to write {HISTORY_PATH}: {e}", file=sys.stderr)
+
+def load_history(labs_root=None):
+    # 回傳 {path: [entry, ...]} (舊到新); labs_root 有給時只留這個 root 底下的
+    prefix = str(labs_root).rstrip("/") + "/" if labs_root else ""
+    runs = {}
+    try:
+        with open(HISTORY_PATH) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("path", "").startswith(prefix):
+                    runs.setdefault(entry["path"], []).append(entry)
+    except OSError:
+        pass
+    return runs
+
+def last_durations(labs_root):
+    # {(lab, prob): 最近一次的秒數}, 給 score board 的 time 欄位用
+    durations = {}
+    for path, entries in load_history(labs_root).items():
+        rel = pathlib.Path(path).relative_to(labs_root).parts
+        if len(rel) in (1, 2) and entries[-1].get("duration") is not None:
+            durations[(rel[0], rel[1] if len(rel) == 2 else "")] = entries[-1]["duration"]
+    return durations
+
+def _schedule_info(dirpath):
+    # (上次的狀態, 上次跑完後輸入有沒有改過, 輸入最新的 mtime)
+    d = pathlib.Path(dirpath)
+    newest = 0
+    for f in [d / "Makefile"] + [f for sub in (DSRC_DIR, SSRC_DIR) for f in (d / sub).rglob("*")]:
+        try:
+            newest = max(newest, f.stat().st_mtime_ns)
+        except OSError:
+            continue
+    try:
+        result_mtime = (d / SRES_DIR / "result.txt").stat().st_mtime_ns
+    except OSError:
+        result_mtime = None
+    return read_result(d, missing="NULL"), result_mtime is None or newest > result_mtime, newest
+
+def schedule_problems(problems, durations=None, parallel=True, policy=None):
+    # smart: 上次沒過或之後改過的先跑; 同一組裡平行時預期最久的先, 一次一題時最近改的先
+    # alpha: 目錄順序
+    problems = list(problems)
+    if (policy or SCHEDULE) != "smart":
+        return problems
+    durations = durations or {}
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as pool:
+        info = list(pool.map(lambda job: _schedule_info(job[2]), problems))
+
+    def key(i):
+        lab, prob, _ = problems[i]
+        status, edited, newest = info[i]
+        urgent = status != "PASS" or edited
+        return (not urgent, -(durations.get((lab, prob)) or 0) if parallel else -newest)
+    return [problems[i] for i in sorted(range(len(problems)), key=key)]
+
+def format_duration(seconds):
+    return "" if seconds is None else f"{seconds:.1f}s"
+
+def summarize_history(runs, top=None):
+    # 每題一個 dict (runs, last, mean, best, first_output, trend), 最慢的在前
+    rows = []
+    for path, entries in runs.items():
+        durations = [e["duration"] for e in entries if e.get("duration") is not None]
+        if not durations:
+            continue
+        earlier = sorted(durations[:-1])
+        median = earlier[len(earlier) // 2] if earlier else None
+        rows.append({
+            "path": path,
+            "runs": len(durations),
+            "last": durations[-1],
+            "mean": sum(durations) / len(durations),
+            "best": min(durations),
+            "first_output": entries[-1].get("first_output"),
+            "output_bytes": entries[-1].get("output_bytes"),
+            "trend": (durations[-1] - median) / median if median else None,
+        })
+    rows.sort(key=lambda r: r["last"], reverse=True)
+    return rows[:top] if top else rows
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+# 分散式 Simulation All: coordinator 透過 multiprocessing.managers 把題目交給 worker
+#    PLAYV_DIST_KEY=secret python3 playV_dist.py worker --connect HOST:PORT [--jobs N]
+# worker 一次拿一題 (不含 sim_result 與 golden 的 tar), 跑完送回結果與 sim_result; golden 檔每個 worker 只拿一次
+# Makefile 用到題目目錄外的檔案 (../common) 的題目 worker 上沒有那些檔案, 留在 coordinator 這台一次一題照原目錄跑
+import io, os, sys, time, zlib, queue, shutil, socket, hashlib, tarfile, argparse, itertools, pathlib, threading
+import subprocess, collections
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+
+from playV_core import (
+    SRES_DIR, GOLDEN_DIR, NOT_STARTED, Runner, Throttle, simulate_problem, input_fingerprint, cached_status,
+    write_manifest, append_history, outside_reason,
+)
+
+DIST_STALE = 60
+HEARTBEAT_SECONDS = 10
+OUTPUT_INTERVAL = 0.25
+MAX_TRIES = 3
+# coordinator 最多先打包幾題放進 queue (worker 開始跑一題才再補一題)
+DIST_PREFETCH = int(os.environ.get("PLAYV_DIST_PREFETCH", "32"))
+DEFAULT_PORT = 50917
+
+def parse_address(text, default_host=""):
+    # "host:port" / "port" / ":port"
+    host, _, port = text.rpartition(":")
+    return (host or default_host, int(port or DEFAULT_PORT))
+
+def authkey_from_env():
+    key = os.environ.get("PLAYV_DIST_KEY")
+    return key.encode() if key else None
+
+def pack_dir(path, skip=(SRES_DIR, GOLDEN_DIR)):
+    # 題目目錄 (不含 sim_result, golden 與 . 開頭的檔案) 打包成 tar.gz bytes
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz", compresslevel=1) as tar:
+        for name in sorted(os.listdir(path)):
+            if not name.startswith(".") and name not in skip:
+                tar.add(os.path.join(path, name), arcname=name)
+    return buf.getvalue()
+
+def unpack_dir(data, dest):
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(dest, filter="data")
+        else:
+            tar.extractall(dest)
+
+def _result(**fields):
+    # 沒有真的跑 simulate_problem 時 (跳過 / 取消 / 出錯) 的結果, 欄位同 simulate_problem
+    result = {"status": "FAIL", "returncode": None, "duration": 0.0, "skipped": False, "cached": False,
+              "speculative": False, "detail": None, "first_output": None, "output_lines": 0, "output_bytes": 0,
+              "diverged": None, "in_place": None, "worker": None}
+    result.update(fields)
+    return result
+
+class _Control:
+    # 已取消的 batch, 透過 manager 與 worker 共用
+    def __init__(self):
+        self.cancelled = set()
+
+    def cancel(self, batch):
+        self.cancelled.add(batch)
+
+    def is_cancelled(self, batch):
+        return batch in self.cancelled
+
+class _Blobs:
+    # golden 檔案, worker 依 key 拿一次後自己留著
+    def __init__(self):
+        self.paths = {}
+        self.lock = threading.Lock()
+
+    def register(self, dirpath):
+        # 回傳 [(相對路徑, key)]; key 由路徑, 大小與 mtime 算出, 檔案改了 worker 就會重拿
+        dirpath = pathlib.Path(dirpath)
+        top = dirpath / GOLDEN_DIR
+        files = []
+        for path in sorted(top.rglob("*")) if top.is_dir() else []:
+            if not path.is_file():
+                continue
+            st = path.stat()
+            key = hashlib.sha1(f"{path.resolve()}\0{st.st_size}\0{st.st_mtime_ns}".encode()).hexdigest()
+            with self.lock:
+                self.paths[key] = (path, st.st_size, st.st_mtime_ns)
+            files.append((str(path.relative_to(dirpath)), key))
+        return files
+
+    def fetch(self, key):
+        # zlib 壓縮的內容; 不認得的 key 或送出後檔案又被改過時回傳 None
+        with self.lock:
+            entry = self.paths.get(key)
+        if entry is None:
+            return None
+        path, size, mtime = entry
+        st = path.stat()
+        if (st.st_size, st.st_mtime_ns) != (size, mtime):
+            return None
+        return zlib.compress(path.read_bytes(), 1)
+
+class DistManager(BaseManager):
+    pass
+
+DistManager.register("jobs")
+DistManager.register("events")
+DistManager.register("control")
+DistManager.register("blobs")
+
+class Coordinator:
+    # 提供 job queue, 把 worker 送回來的事件轉成 simulate_problem 的結果
+    def __init__(self, address=("", DEFAULT_PORT), authkey=None, local_workers=0):
+        self.authkey = authkey or os.urandom(16).hex().encode()
+        self.job_q = queue.Queue()
+        self.event_q = queue.Queue()
+        self.control = _Control()
+        self.blobs = _Blobs()
+        self.batch_ids = itertools.count(1)
+        self.batch = None
+        self.runner = None
+        self.local = []
+
+        class _Server(BaseManager):
+            pass
+        _Server.register("jobs", callable=lambda: self.job_q)
+        _Server.register("events", callable=lambda: self.event_q)
+        _Server.register("control", callable=lambda: self.control)
+        _Server.register("blobs", callable=lambda: self.blobs)
+        self.server = _Server(address=address, authkey=self.authkey).get_server()
+        self.address = self.server.address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        for _ in range(local_workers):
+            self.spawn_local()
+
+    def spawn_local(self, jobs=1):
+        env = dict(os.environ, PLAYV_DIST_KEY=self.authkey.decode())
+        cmd = [sys.executable, str(pathlib.Path(__file__).resolve()), "worker",
+               "--connect", f"127.0.0.1:{self.address[1]}", "--jobs", str(jobs)]
+        self.local.append(subprocess.Popen(cmd, env=env, stdin=subprocess.DEVNULL))
+
+    def cancel(self):
+        if self.batch is not None:
+            self.control.cancel(self.batch)
+            if self.runner:
+                self.runner.cancel()
+            # 叫醒正在等事件的 run()
+            self.event_q.put(("cancel", self.batch, None))
+
+    def close(self):
+        for p in self.local:
+            p.terminate()
+        for p in self.local:
+            try:
+                p.wait(5)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        self.local = []
+
+    def run(self, problems, force=True, golden_check=False, fail_fast=False, durations=None, ordered=False):
+        # 產生 (lab, prob, result, 輸出行), 依完成順序; result 的欄位同 simulate_problem, 多一個 worker
+        # ordered: problems 已經排好 (schedule_problems), 照原順序送出
+        batch = self.batch = next(self.batch_ids)
+        self.runner = Runner()
+        durations = durations or {}
+        pending = {}
+        for i, (lab, prob, dirpath) in enumerate(problems):
+            fingerprint = input_fingerprint(dirpath)
+            status = None if force else cached_status(dirpath, fingerprint)
+            if status:
+                yield lab, prob, _result(status=status, skipped=True), []
+                continue
+            pending[i] = {"lab": lab, "prob": prob, "dirpath": dirpath, "fingerprint": fingerprint,
+                          "out": [], "seen": None, "tries": 0}
+        # 預期最久的先送出去, 收尾時才不會只剩一台在跑長題目
+        order = list(pending)
+        if not ordered:
+            order.sort(key=lambda i: -(durations.get((pending[i]["lab"], pending[i]["prob"])) or 0))
+        unsent = collections.deque(order)
+        queued = set()
+        options = {"golden_check": golden_check, "fail_fast": fail_fast}
+        local = ThreadPoolExecutor(max_workers=1)
+        try:
+            yield from self._collect(batch, pending, unsent, queued, options, local)
+        finally:
+            local.shutdown(wait=False, cancel_futures=True)
+
+    def _collect(self, batch, pending, unsent, queued, options, local):
+        last_check = time.monotonic()
+        while pending:
+            yield from self._send(batch, pending, unsent, queued, options, local)
+            if not pending:
+                break
+            try:
+                event = self.event_q.get(timeout=1)
+            except queue.Empty:
+                event = None
+            # worker 一直有輸出時也要每秒檢查一次取消與失聯
+            if event is None or event[0] == "cancel" or time.monotonic() - last_check >= 1:
+                last_check = time.monotonic()
+                yield from self._check_pending(batch, pending, unsent, queued)
+            if event is None:
+                continue
+            kind, ev_batch, i = event[:3]
+            job = pending.get(i) if ev_batch == batch else None
+            if job is None:
+                continue
+            job["seen"] = time.monotonic()
+            queued.discard(i)
+            if kind == "output":
+                job["out"] += event[3]
+            elif kind == "done":
+                del pending[i]
+                yield job["lab"], job["prob"], self._finish(job, event[3], event[4]), job["out"]
+
+    def _send(self, batch, pending, unsent, queued, options, local):
+        # 用到才打包: queue 裡最多 DIST_PREFETCH 題等 worker 來拿
+        while unsent and len(queued) < DIST_PREFETCH and not self.control.is_cancelled(batch):
+            i = unsent.popleft()
+            job = pending[i]
+            reason = outside_reason(job["dirpath"])
+            if reason:
+                job["local"] = True
+                local.submit(self._run_local, batch, i, job["dirpath"], options, f"{reason}; not sent to a worker")
+                continue
+            try:
+                data = pack_dir(job["dirpath"])
+                golden = self.blobs.register(job["dirpath"])
+            except OSError as e:
+                del pending[i]
+                yield job["lab"], job["prob"], _result(detail=f"pack {job['dirpath']}: {e}"), []
+                continue
+            job["job"] = {"batch": batch, "id": i, "name": f"{job['lab']}/{job['prob']}", "data": data,
+                          "golden": golden, **options}
+            queued.add(i)
+            self.job_q.put(job["job"])
+
+    def _check_pending(self, batch, pending, unsent, queued):
+        # 取消後剩下的工作全部算 CANCELLED, 不等 worker 回報; 太久沒消息的工作 (不論開始了沒) 重新排入
+        if self.control.is_cancelled(batch):
+            with self.job_q.mutex:
+                self.job_q.queue = collections.deque(j for j in self.job_q.queue if j["batch"] != batch)
+            for i, entry in list(pending.items()):
+                del pending[i]
+                yield entry["lab"], entry["prob"], _result(status="CANCELLED", detail=NOT_STARTED), entry["out"]
+            unsent.clear()
+            queued.clear()
+            return
+        # queue 裡已經不見的工作是被 worker 拿走了, 從這時起算失聯時間
+        with self.job_q.mutex:
+            waiting = {j["id"] for j in self.job_q.queue if j["batch"] == batch}
+        now = time.monotonic()
+        for i in queued - waiting:
+            if i in pending and pending[i]["seen"] is None:
+                pending[i]["seen"] = now
+        queued &= waiting
+        for i, job in list(pending.items()):
+            if job.get("local") or job["seen"] is None or now - job["seen"] < DIST_STALE:
+                continue
+            job["tries"] += 1
+            job["seen"] = None
+            if job["tries"] >= MAX_TRIES:
+                del pending[i]
+                yield job["lab"], job["prob"], _result(detail=f"worker lost {job['tries']} time(s)"), job["out"]
+            else:
+                job["out"] = []
+                queued.add(i)
+                self.job_q.put(job["job"])
+
+    def _run_local(self, batch, i, dirpath, options, reason):
+        # 結果與 worker 送回來的一樣經過事件 queue, manifest / history 由 _finish 寫
+        lines = []
+        try:
+            result = simulate_problem(self.runner, dirpath, on_line=lines.append, record=False, **options)
+        except Exception as e:
+            result = _result(detail=f"make test: {e}")
+        result.update(worker=socket.gethostname(), in_place=reason)
+        self.event_q.put(("output", batch, i, lines))
+        self.event_q.put(("done", batch, i, result, None))
+
+    def _finish(self, job, result, sres):
+        # worker 回傳的 sim_result 換掉本地的, 與本機 simulate_problem 一樣寫 manifest / history
+        dirpath = job["dirpath"]
+        if sres is not None:
+            try:
+                shutil.rmtree(dirpath / SRES_DIR, ignore_errors=True)
+                unpack_dir(sres, dirpath / SRES_DIR)
+            except (OSError, tarfile.TarError) as e:
+                result.update(status="FAIL", detail=f"unpack sim_result from {result.get('worker')}: {e}")
+                return result
+        if not result["detail"] and not result["cached"]:
+            write_manifest(dirpath, job["fingerprint"], result["status"])
+        if result["returncode"] is not None and not result["cached"]:
+            append_history(dirpath, result)
+        return result
+
+def dist_from_env():
+    # PLAYV_DIST=[host:]port 或 PLAYV_DIST_LOCAL=N 時建立 Coordinator, 否則回傳 None
+    address = os.environ.get("PLAYV_DIST", "")
+    local = int(os.environ.get("PLAYV_DIST_LOCAL", "0") or 0)
+    if not address and not local:
+        return None
+    authkey = authkey_from_env()
+    if address and not authkey:
+        print("[playV] PLAYV_DIST is set but PLAYV_DIST_KEY is not; remote workers need the same key", file=sys.stderr)
+        return None
+    addr = parse_address(address) if address else ("127.0.0.1", 0)
+    coordinator = Coordinator(addr, authkey, local)
+    print(f"[playV] distributed Simulation All listening on {coordinator.address[0] or '*'}:{coordinator.address[1]}"
+          f" ({local} local worker(s))", file=sys.stderr)
+    return coordinator
+
+def _golden_file(blobs, key, cache_dir):
+    # 每個 golden 檔案每個 worker 只從 coordinator 拿一次
+    path = cache_dir / key
+    if not path.exists():
+        data = blobs.fetch(key)
+        if data is None:
+            raise OSError(f"golden file {key} changed on the coordinator")
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = cache_dir / f"{key}.{threading.get_ident()}.tmp"
+        tmp.write_bytes(zlib.decompress(data))
+        os.replace(tmp, path)
+    return path
+
+def _run_job(job, events, control, blobs, workdir):
+    dest = workdir / f"job-{threading.get_ident()}"
+    shutil.rmtree(dest, ignore_errors=True)
+    dest.mkdir(parents=True)
+    unpack_dir(job["data"], dest)
+    for rel, key in job["golden"]:
+        src = _golden_file(blobs, key, workdir / "golden")
+        (dest / rel).parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(src, dest / rel)
+        except OSError:
+            shutil.copy2(src, dest / rel)
+    runner = Runner()
+    lines, lock, finished = [], threading.Lock(), threading.Event()
+    # 解開與拿 golden 可能很久, 開跑前再回報一次
+    events.put(("start", job["batch"], job["id"]))
+
+    def on_line(line):
+        with lock:
+            lines.append(line)
+
+    def pump():
+        # 輸出每 OUTPUT_INTERVAL 秒送一次, 沒有輸出時也定期回報還活著; 順便看有沒有被取消
+        last = time.monotonic()
+        while not finished.wait(OUTPUT_INTERVAL):
+            with lock:
+                chunk, lines[:] = lines[:], []
+            if chunk or time.monotonic() - last > HEARTBEAT_SECONDS:
+                events.put(("output", job["batch"], job["id"], chunk))
+                last = time.monotonic()
+            if control.is_cancelled(job["batch"]):
+                runner.cancel()
+
+    t = threading.Thread(target=pump, daemon=True)
+    t.start()
+    try:
+        result = simulate_problem(runner, dest, on_line=on_line, record=False,
+                                  golden_check=job["golden_check"], fail_fast=job["fail_fast"])
+    finally:
+        finished.set()
+        t.join()
+    with lock:
+        if lines:
+            events.put(("output", job["batch"], job["id"], lines[:]))
+    result["worker"] = f"{socket.gethostname()}:{os.getpid()}"
+    sres = dest / SRES_DIR
+    data = None
+    if sres.is_dir():
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w:gz", compresslevel=1) as tar:
+            tar.add(sres, arcname=".")
+        data = buf.getvalue()
+    events.put(("done", job["batch"], job["id"], result, data))
+    shutil.rmtree(dest, ignore_errors=True)
+
+def worker_main(address, authkey, jobs, workdir):
+    manager = DistManager(address=address, authkey=authkey)
+    manager.connect()
+    print(f"[playV] worker {socket.gethostname()}:{os.getpid()} connected to {address[0]}:{address[1]}", file=sys.stderr)
+
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    throttle = Throttle(jobs)
+
+    def loop():
+        # coordinator 關掉時 proxy 丟出 EOFError / ConnectionError, thread 結束
+        try:
+            job_q, events, control, blobs = manager.jobs(), manager.events(), manager.control(), manager.blobs()
+            while True:
+                # 機器忙時先不拿工作, 留給其他 worker
+                with throttle.slot():
+                    try:
+                        job = job_q.get(timeout=5)
+                    except queue.Empty:
+                        continue
+                    events.put(("start", job["batch"], job["id"]))
+                    if control.is_cancelled(job["batch"]):
+                        events.put(("done", job["batch"], job["id"], _result(status="CANCELLED", detail=NOT_STARTED),
+                                    None))
+                        continue
+                    try:
+                        _run_job(job, events, control, blobs, workdir)
+                    except (EOFError, ConnectionError):
+                        raise
+                    except Exception as e:
+                        print(f"[Warning] {job['name']}: {e}", file=sys.stderr)
+                        events.put(("done", job["batch"], job["id"], _result(detail=f"worker error: {e}", worker=name),
+                                    None))
+        except (EOFError, ConnectionError) as e:
+            print(f"[playV] worker {name} disconnected: {e}", file=sys.stderr)
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(max(1, jobs))]
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            t.join()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="playV distributed simulation worker")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("worker", help="run jobs from a coordinator")
+    w.add_argument("--connect", required=True, metavar="HOST:PORT")
+    w.add_argument("--jobs", "-j", type=int, default=1, help="simulations run at the same time (default: 1)")
+    w.add_argument("--workdir", type=pathlib.Path,
+                   default=pathlib.Path("/dev/shm" if os.path.isdir("/dev/shm") else "/tmp") / f"playV-worker-{os.getpid()}")
+    args = ap.parse_args(argv)
+    authkey = authkey_from_env()
+    if not authkey:
+        print("PLAYV_DIST_KEY is not set", file=sys.stderr)
+        return 2
+    try:
+        return worker_main(parse_address(args.connect, "127.0.0.1"), authkey, args.jobs, args.workdir)
+    except (ConnectionError, EOFError) as e:
+        print(f"[playV] worker stopped: {e}", file=sys.stderr)
+        return 1
+    finally:
+        shutil.rmtree(args.workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# PLAYV_MONITOR=1: 統計 main loop 上每個 callback 的次數, 執行與排隊時間, 結束時寫成 JSON
+# PLAYV_PROFILE=cprofile|sample: 第一次 Simulation All 時 profile main thread
+import os, sys, json, time, atexit, pathlib, threading, collections
+
+MONITOR = os.environ.get("PLAYV_MONITOR", "") not in ("", "0")
+MONITOR_MS = float(os.environ.get("PLAYV_MONITOR_MS", "50"))
+PROFILE_MODE = os.environ.get("PLAYV_PROFILE", "")
+SAMPLE_MS = float(os.environ.get("PLAYV_PROFILE_SAMPLE_MS", "5"))
+MAX_SLOW = 500
+
+# 直方圖的上界 (ms), 最後一格是 >= 1024
+BUCKETS_MS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+def _bucket(ms):
+    for i, bound in enumerate(BUCKETS_MS):
+        if ms < bound:
+            return i
+    return len(BUCKETS_MS)
+
+def _bucket_labels():
+    labels, low = [], 0
+    for bound in BUCKETS_MS:
+        labels.append(f"{low}-{bound}ms")
+        low = bound
+    return labels + [f">={low}ms"]
+
+def callback_name(func):
+    # 方法用 qualname; lambda / 內部函式再加上檔名與行號才分得出來
+    func = getattr(func, "__func__", func)
+    name = getattr(func, "__qualname__", None) or repr(func)
+    code = getattr(func, "__code__", None)
+    if code is not None and ("<lambda>" in name or "<locals>" in name):
+        name += f" ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name
+
+class _Stat:
+    __slots__ = ("kind", "count", "total", "max", "exec_hist", "delays", "delay_total", "delay_max", "delay_hist")
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.count = self.delays = 0
+        self.total = self.max = self.delay_total = self.delay_max = 0.0
+        self.exec_hist = [0] * (len(BUCKETS_MS) + 1)
+        self.delay_hist = [0] * (len(BUCKETS_MS) + 1)
+
+    def as_dict(self):
+        d = {"kind": self.kind, "count": self.count, "total_ms": round(self.total, 3), "max_ms": round(self.max, 3),
+             "exec_hist": self.exec_hist}
+        if self.delays:
+            d.update(delay_count=self.delays, delay_total_ms=round(self.delay_total, 3),
+                     delay_max_ms=round(self.delay_max, 3), delay_hist=self.delay_hist)
+        return d
+
+class LatencyMonitor:
+    def __init__(self, path, threshold_ms=MONITOR_MS, profile_mode=PROFILE_MODE):
+        self.path = pathlib.Path(path)
+        self.threshold_ms = threshold_ms
+        self.profile_mode = profile_mode
+        self.stats = {}
+        self.slow = []
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.profiler = None
+        self.profile_path = None
+        self.profiled = False
+        self.dumped = False
+
+    def _record(self, name, kind, exec_ms, delay_ms=None):
+        # 只在 main loop 上呼叫; lock 只是給 dump 用
+        with self.lock:
+            st = self.stats.get(name)
+            if st is None:
+                st = self.stats[name] = _Stat(kind)
+            st.count += 1
+            st.total += exec_ms
+            st.max = max(st.max, exec_ms)
+            st.exec_hist[_bucket(exec_ms)] += 1
+            if delay_ms is not None:
+                st.delays += 1
+                st.delay_total += delay_ms
+                st.delay_max = max(st.delay_max, delay_ms)
+                st.delay_hist[_bucket(delay_ms)] += 1
+            if exec_ms >= self.threshold_ms and len(self.slow) < MAX_SLOW:
+                self.slow.append({"name": name, "kind": kind, "ms": round(exec_ms, 3),
+                                  "at": round(time.time() - self.started, 3)})
+                slow = True
+            else:
+                slow = False
+        if slow:
+            sys.__stderr__.write(f"[playV] main loop blocked {exec_ms:.0f} ms in {kind} {name}\n")
+
+    def wrap(self, func, kind, name=None, queued_at=None):
+        # queued_at: idle_add 的時間, 第一次執行時記下排隊延遲
+        name = name or callback_name(func)
+        pending = [queued_at]
+        def wrapper(*args):
+            t0 = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                t1 = time.perf_counter()
+                delay = None if pending[0] is None else (t0 - pending[0]) * 1000
+                pending[0] = None
+                self._record(name, kind, (t1 - t0) * 1000, delay)
+        return wrapper
+
+    def install(self, GLib, GObject, Gtk=None):
+        # 換掉 GLib.idle_add / timeout_add, GObject.Object.connect 與 (有 Gtk 時) TreeView 的 callback
+        idle_add, timeout_add = GLib.idle_add, GLib.timeout_add
+        def monitored_idle_add(func, *args, **kw):
+            return idle_add(self.wrap(func, "idle", queued_at=time.perf_counter()), *args, **kw)
+        def monitored_timeout_add(interval, func, *args, **kw):
+            return timeout_add(interval, self.wrap(func, "timeout"), *args, **kw)
+        GLib.idle_add = monitored_idle_add
+        GLib.timeout_add = monitored_timeout_add
+
+        connect = GObject.Object.connect
+        def monitored_connect(obj, signal, handler, *args):
+            return connect(obj, signal, self.wrap(handler, "signal", f"{type(obj).__name__}::{signal} -> "
+                                                                     f"{callback_name(handler)}"), *args)
+        GObject.Object.connect = monitored_connect
+
+        if Gtk is not None:
+            # 每個 cell / row 都會呼叫的函式: 統計照記, 每次呼叫都很短, 超過門檻才會列出
+            def patch(cls, method, kind, func_index):
+                orig = getattr(cls, method)
+                def patched(obj, *args):
+                    args = list(args)
+                    args[func_index] = self.wrap(args[func_index], kind)
+                    return orig(obj, *args)
+                setattr(cls, method, patched)
+            patch(Gtk.TreeViewColumn, "set_cell_data_func", "cell", 1)
+            patch(Gtk.TreeModelFilter, "set_visible_func", "visible", 0)
+            patch(Gtk.TreeModelSort, "set_sort_func", "sort", 1)
+        atexit.register(self.dump)
+
+    def start_profile(self, label):
+        # 只 profile 第一次 (例如第一次 Simulation All); 在 main thread 呼叫
+        if self.profiled or self.profile_mode not in ("cprofile", "sample"):
+            return
+        self.profiled = True
+        stem = self.path.with_name(f"{self.path.stem}-{label}")
+        if self.profile_mode == "cprofile":
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profile_path = stem.with_suffix(".prof")
+            self.profiler.enable()
+        else:
+            self.profiler = _Sampler(threading.get_ident(), SAMPLE_MS / 1000)
+            self.profile_path = stem.with_suffix(".txt")
+            self.profiler.start()
+
+    def stop_profile(self):
+        if self.profiler is None:
+            return False
+        profiler, self.profiler = self.profiler, None
+        try:
+            self.profile_path.parent.mkdir(parents=True, exist_ok=True)
+            if self.profile_mode == "cprofile":
+                profiler.disable()
+                profiler.dump_stats(self.profile_path)
+            else:
+                profiler.stop()
+                profiler.write(self.profile_path)
+            sys.__stderr__.write(f"[playV] profile written to {self.profile_path}\n")
+        except OSError as e:
+            sys.__stderr__.write(f"[Warning] Failed to write {self.profile_path}: {e}\n")
+        return False
+
+    def dump(self):
+        if self.dumped:
+            return
+        self.dumped = True
+        self.stop_profile()
+        with self.lock:
+            callbacks = sorted(self.stats.items(), key=lambda kv: -kv[1].total)
+            data = {
+                "threshold_ms": self.threshold_ms,
+                "seconds": round(time.time() - self.started, 3),
+                "buckets": _bucket_labels(),
+                "callbacks": {name: st.as_dict() for name, st in callbacks},
+                "slow": self.slow,
+                "profile": str(self.profile_path) if self.profile_path else None,
+            }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(data, indent=1))
+            sys.__stderr__.write(f"[playV] main-loop latency written to {self.path}\n")
+        except OSError as e:
+            sys.__stderr__.write(f"[Warning] Failed to write {self.path}: {e}\n")
+
+class _Sampler(threading.Thread):
+    # 每 interval 秒記一次某個 thread 的 Python stack (collapsed stack 格式)
+    def __init__(self, ident, interval):
+        super().__init__(daemon=True)
+        self.target = ident
+        self.interval = interval
+        self.counts = collections.Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def write(self, path):
+        pathlib.Path(path).write_text("".join(f"{stack} {n}\n" for stack, n in self.counts.most_common()))
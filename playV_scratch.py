@@ -0,0 +1,162 @@
+# PLAYV_SCRATCH: 每題複製到本機的 scratch 目錄跑 make test, 只把 sim_result 複製回去
+# Makefile 用到題目目錄外的檔案 (../common) 的題目 sync_in 會拒絕, 由呼叫端改在原目錄跑
+import os, sys, json, gzip, shutil, getpass, hashlib, pathlib
+
+from playV_core import SRES_DIR, MANIFEST_NAME, outside_reason
+
+SYNC_MANIFEST = ".playv_synced.json"
+SHM_ROOT = pathlib.Path("/dev/shm") / f"playV-{getpass.getuser()}"
+
+def _scratch_root_from_env():
+    value = os.environ.get("PLAYV_SCRATCH", "")
+    if value in ("", "0"):
+        return None
+    if value in ("1", "shm"):
+        return SHM_ROOT
+    return pathlib.Path(value).expanduser()
+
+SCRATCH_ROOT = _scratch_root_from_env()
+SCRATCH_GZIP = os.environ.get("PLAYV_SCRATCH_GZIP", "") not in ("", "0")
+
+def _same(src_st, dst):
+    try:
+        st = os.stat(dst)
+    except OSError:
+        return False
+    return st.st_size == src_st.st_size and st.st_mtime_ns == src_st.st_mtime_ns
+
+def _mtime_matches(src_st, dst):
+    try:
+        return os.stat(dst).st_mtime_ns == src_st.st_mtime_ns
+    except OSError:
+        return False
+
+def _walk_files(top, skip_top=()):
+    # 回傳 {相對路徑: stat}, 略過 . 開頭的檔案與 top 下 skip_top 裡的目錄
+    files = {}
+    for root, dirs, names in os.walk(top):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and not (root == str(top) and d in skip_top)]
+        for name in names:
+            if not name.startswith("."):
+                path = os.path.join(root, name)
+                files[os.path.relpath(path, top)] = os.stat(path)
+    return files
+
+class Scratch:
+    def __init__(self, root=SCRATCH_ROOT, gzip_vcd=SCRATCH_GZIP):
+        self.root = pathlib.Path(root)
+        self.gzip_vcd = gzip_vcd
+
+    def path_for(self, dirpath):
+        dirpath = pathlib.Path(dirpath).resolve()
+        tag = hashlib.sha1(str(dirpath).encode()).hexdigest()[:8]
+        return self.root / f"{dirpath.parent.name}-{dirpath.name}-{tag}"
+
+    def sync_in(self, dirpath):
+        # 只複製有變的輸入 (copy2 保留 mtime, make 才判斷得出要不要重編);
+        # 上次同步過但來源已刪掉的檔案也刪掉, make 產生的檔案不動
+        dirpath = pathlib.Path(dirpath)
+        reason = outside_reason(dirpath)
+        if reason:
+            raise OSError(reason)
+        scratch = self.path_for(dirpath)
+        scratch.mkdir(parents=True, exist_ok=True)
+        try:
+            synced = set(json.loads((scratch / SYNC_MANIFEST).read_text()))
+        except (OSError, ValueError):
+            synced = set()
+        files = _walk_files(dirpath, skip_top=(SRES_DIR,))
+        for rel, st in files.items():
+            dst = scratch / rel
+            if not _same(st, dst):
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(dirpath / rel, dst)
+        for rel in synced - files.keys():
+            try:
+                (scratch / rel).unlink()
+            except OSError:
+                pass
+        (scratch / SYNC_MANIFEST).write_text(json.dumps(sorted(files)))
+        self._mirror_results(dirpath, scratch)
+        return scratch
+
+    def _mirror_results(self, dirpath, scratch):
+        # scratch/sim_result 改成跟真正的 sim_result 一樣 (make clean 過就是空的);
+        # 不然 make test 沒寫 result.txt 時, 上次留在 scratch 的結果會被 sync_out 當成這次的複製回去
+        src = dirpath / SRES_DIR
+        dst = scratch / SRES_DIR
+        real = _walk_files(src) if src.is_dir() else {}
+        have = _walk_files(dst) if dst.is_dir() else {}
+        keep = set()
+        for rel, st in real.items():
+            # sync_out 壓縮過的 VCD: scratch 裡 mtime 相同的原檔就是它
+            plain = rel[:-3] if self.gzip_vcd and rel.endswith(".vcd.gz") else None
+            if plain and plain in have and have[plain].st_mtime_ns == st.st_mtime_ns:
+                keep.add(plain)
+                continue
+            keep.add(rel)
+            if not _same(st, dst / rel):
+                (dst / rel).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(src / rel, dst / rel)
+        for rel in have.keys() - keep:
+            (dst / rel).unlink(missing_ok=True)
+
+    def sync_out(self, dirpath, scratch):
+        # scratch/sim_result -> dirpath/sim_result, result.txt 最後寫 (watcher 看到時其他檔案已就緒)
+        src = pathlib.Path(scratch) / SRES_DIR
+        dst = pathlib.Path(dirpath) / SRES_DIR
+        if not src.is_dir():
+            return
+        wanted = {}
+        for rel, st in _walk_files(src).items():
+            target = rel + ".gz" if self.gzip_vcd and rel.endswith(".vcd") else rel
+            wanted[target] = (rel, st)
+        dst.mkdir(exist_ok=True)
+        for rel in _walk_files(dst).keys() - wanted.keys():
+            try:
+                (dst / rel).unlink()
+            except OSError:
+                pass
+        (dst / MANIFEST_NAME).unlink(missing_ok=True)
+        for target in sorted(wanted, key=lambda t: t == "result.txt"):
+            rel, st = wanted[target]
+            out = dst / target
+            out.parent.mkdir(parents=True, exist_ok=True)
+            if target == rel:
+                if not _same(st, out):
+                    shutil.copy2(src / rel, out)
+                continue
+            # 壓縮檔的 mtime 設成原始 VCD 的, 下次沒變就不必再壓
+            if not _mtime_matches(st, out):
+                with open(src / rel, "rb") as f_in, gzip.open(out, "wb", compresslevel=3) as f_out:
+                    shutil.copyfileobj(f_in, f_out, 1 << 20)
+                os.utime(out, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+def scratch_from_env():
+    # PLAYV_SCRATCH 沒設時回傳 None
+    return Scratch() if SCRATCH_ROOT else None
+
+def wave_exists(path):
+    return pathlib.Path(path).is_file() or pathlib.Path(path).with_name(pathlib.Path(path).name + ".gz").is_file()
+
+def local_wave(path):
+    # path 不存在但有 path.gz 時解壓到本機 (scratch root, 沒有就 /tmp) 並回傳解壓後的路徑
+    path = pathlib.Path(path)
+    gz = path.with_name(path.name + ".gz")
+    if path.is_file() or not gz.is_file():
+        return path
+    root = SCRATCH_ROOT or pathlib.Path("/tmp") / f"playV-{getpass.getuser()}"
+    out = root / "waves" / f"{hashlib.sha1(str(gz.resolve()).encode()).hexdigest()[:16]}-{path.name}"
+    try:
+        st = gz.stat()
+        if not _mtime_matches(st, out):
+            out.parent.mkdir(parents=True, exist_ok=True)
+            tmp = out.with_name(out.name + ".tmp")
+            with gzip.open(gz, "rb") as f_in, open(tmp, "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out, 1 << 20)
+            os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+            os.replace(tmp, out)
+    except OSError as e:
+        print(f"[Warning] Failed to decompress {gz}: {e}", file=sys.stderr)
+        return path
+    return out
@@ -0,0 +1,154 @@
+# PLAYV_SPECULATE=1: 選到的題目存檔後在背景 (最低優先權, scratch 裡) 先跑 make test,
+# 按 Simulation 時輸入沒變就直接用這次的結果; 學生的目錄在那之前都不動
+import os, sys, time, getpass, pathlib, threading
+
+from playV_core import Runner, input_fingerprint, cached_status
+from playV_scratch import Scratch
+
+SPECULATE = os.environ.get("PLAYV_SPECULATE", "") not in ("", "0")
+SPEC_DEBOUNCE = float(os.environ.get("PLAYV_SPECULATE_DEBOUNCE", "1.5"))
+# 沒有 file monitor (PLAYV_WATCH=poll 或 Gio 不能用) 時才每 SPEC_POLL 秒重算 fingerprint, 與 StatusWatcher 的 POLL_SECONDS 相同
+SPEC_POLL = 3
+SPEC_ROOT = pathlib.Path("/dev/shm" if os.path.isdir("/dev/shm") else "/tmp") / f"playV-spec-{getpass.getuser()}"
+
+class Speculator:
+    # 存檔由呼叫端的 file monitor 用 notify() 通知; poll=True 時自己 stat
+    def __init__(self, root=SPEC_ROOT, debounce=SPEC_DEBOUNCE, poll=False):
+        self.scratch = Scratch(root, gzip_vcd=False)
+        self.debounce = debounce
+        self.lock = threading.Lock()
+        self.dirpath = None
+        self.seen = None          # 最後一次開始跑的 fingerprint
+        self.changed_at = None    # 最後一次變動的時間, None 表示沒有待跑的變動
+        self.generation = 0       # 換題目 / 新的一次執行就 +1, 舊的結果丟掉
+        self.runner = None
+        self.ready = None         # (dirpath, fingerprint, returncode, lines, scratch dir)
+        self.polling = False
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        threading.Thread(target=self._loop, daemon=True).start()
+        if poll:
+            self.start_polling()
+
+    def watch(self, dirpath):
+        # 換到另一題: 取消進行中的執行; 目前的內容不跑, 等下次存檔
+        dirpath = pathlib.Path(dirpath)
+        with self.lock:
+            if dirpath == self.dirpath:
+                return
+            self._supersede()
+            self.dirpath = dirpath
+            self.seen = None
+            self.changed_at = None
+
+    def notify(self):
+        # 看著的題目有檔案變動 (任何 thread 都可呼叫); 停了 debounce 秒沒再變才跑
+        with self.lock:
+            if self.dirpath is None:
+                return
+            self.changed_at = time.monotonic()
+        self.wake.set()
+
+    def start_polling(self):
+        # 沒有 file monitor 可用時的退路
+        with self.lock:
+            if self.polling:
+                return
+            self.polling = True
+        threading.Thread(target=self._poll_loop, daemon=True).start()
+
+    def _supersede(self):
+        # 呼叫時已拿著 lock
+        self.generation += 1
+        if self.runner:
+            self.runner.cancel()
+            self.runner = None
+
+    def _poll_loop(self):
+        last = None
+        while not self.stopped.wait(SPEC_POLL):
+            dirpath = self.dirpath
+            if dirpath is None:
+                continue
+            fp = input_fingerprint(dirpath)
+            if last and last[0] == dirpath and last[1] != fp:
+                self.notify()
+            last = (dirpath, fp)
+
+    def _loop(self):
+        timeout = None
+        while not self.stopped.is_set():
+            self.wake.wait(timeout)
+            self.wake.clear()
+            with self.lock:
+                dirpath, changed_at = self.dirpath, self.changed_at
+            if changed_at is None:
+                timeout = None
+                continue
+            timeout = changed_at + self.debounce - time.monotonic()
+            if timeout > 0:
+                continue
+            timeout = None
+            self._start(dirpath, changed_at)
+
+    def _start(self, dirpath, changed_at):
+        fp = input_fingerprint(dirpath)
+        # 真正的 sim_result 已經是這份輸入的結果就不必跑
+        done = cached_status(dirpath, fp)
+        with self.lock:
+            # 算 fingerprint 時又存檔了: 交給下一輪
+            if dirpath != self.dirpath or changed_at != self.changed_at:
+                return
+            self.changed_at = None
+            if done or fp == self.seen:
+                return
+            self.seen = fp
+            self._supersede()
+            self.runner = runner = Runner(low_priority=True)
+            generation = self.generation
+        threading.Thread(target=self._run, args=(runner, generation, dirpath, fp), daemon=True).start()
+
+    def _run(self, runner, generation, dirpath, fp):
+        lines = []
+        ready = None
+        try:
+            cwd = self.scratch.sync_in(dirpath)
+            rc, killed, _ = runner.run(["make", "test"], cwd=cwd, on_line=lines.append)
+            # 跑的時候又存檔了 (或被取消), 結果就不算數
+            if not killed and input_fingerprint(dirpath) == fp:
+                ready = (dirpath, fp, rc, lines, cwd)
+        except OSError as e:
+            print(f"[Warning] Background simulation of {dirpath} failed: {e}", file=sys.stderr)
+        finally:
+            with self.lock:
+                if self.runner is runner:
+                    self.runner = None
+                if ready and generation == self.generation:
+                    self.ready = ready
+
+    def take(self, dirpath, fingerprint):
+        # 輸入相同時把 sim_result 複製到 dirpath 並回傳 (returncode, 輸出行), 否則回傳 None; 還在跑的就取消
+        dirpath = pathlib.Path(dirpath)
+        with self.lock:
+            ready, self.ready = self.ready, None
+            if self.runner and dirpath == self.dirpath:
+                self._supersede()
+        if not ready or ready[:2] != (dirpath, fingerprint):
+            return None
+        _, _, rc, lines, cwd = ready
+        try:
+            self.scratch.sync_out(dirpath, cwd)
+        except OSError as e:
+            print(f"[Warning] Failed to copy the background result to {dirpath}: {e}", file=sys.stderr)
+            return None
+        return rc, lines
+
+    def close(self):
+        self.stopped.set()
+        self.wake.set()
+        with self.lock:
+            self._supersede()
+
+def speculator_from_env(poll=False):
+    # PLAYV_SPECULATE 沒設時回傳 None
+    return Speculator(poll=poll) if SPECULATE else None
@@ -0,0 +1,183 @@
+# Reset Every Design: 只複製 / 刪除 dev 與 public labs 之間有差異的檔案
+import os, sys, glob, stat, shutil, hashlib, pathlib, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from playV_core import READ_WORKERS
+
+def _digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.digest()
+
+def _scan(top):
+    # {相對路徑: lstat}, 目錄也列進去 (結尾不加 /); 不存在時回傳 {}
+    entries = {}
+    top = str(top)
+    if not os.path.isdir(top) or os.path.islink(top):
+        return entries
+    for root, dirs, names in os.walk(top):
+        for name in dirs + names:
+            path = os.path.join(root, name)
+            entries[os.path.relpath(path, top)] = os.lstat(path)
+        # 指向目錄的 symlink 當一般項目處理, 不走進去
+        dirs[:] = [d for d in dirs if not os.path.islink(os.path.join(root, d))]
+    return entries
+
+def _kind(st):
+    if stat.S_ISLNK(st.st_mode):
+        return "link"
+    return "dir" if stat.S_ISDIR(st.st_mode) else "file"
+
+def plan_sync(dev_root, pub_root, scope=None):
+    # 回傳 pub_root 底下的 (copies, removals, touches, unchanged); touches 為內容相同只要補 mtime 的檔案
+    dev_root, pub_root = pathlib.Path(dev_root), pathlib.Path(pub_root)
+    # scope 為 None 時是兩邊所有的 lab*, 否則就是 scope ("lab1" 或 "lab1/p1")
+    if scope:
+        names = {str(scope)}
+    else:
+        names = {os.path.basename(p) for root in (dev_root, pub_root) for p in glob.glob(str(root / "lab*"))}
+    copies, removals, touches, unchanged = [], [], [], 0
+    for name in sorted(names):
+        src_entries = _scan(dev_root / name)
+        dst_entries = _scan(pub_root / name)
+        if src_entries or (dev_root / name).is_dir():
+            src_entries[""] = os.lstat(dev_root / name)
+        if dst_entries or (pub_root / name).exists():
+            dst_entries[""] = os.lstat(pub_root / name)
+        for rel in sorted(src_entries):
+            st = src_entries[rel]
+            dst = dst_entries.get(rel)
+            path = os.path.normpath(os.path.join(name, rel))
+            if dst is None or _kind(dst) != _kind(st):
+                if dst is not None:
+                    removals.append(path)
+                copies.append(path)
+            elif _kind(st) == "dir":
+                unchanged += 1
+            elif _kind(st) == "link":
+                if os.readlink(dev_root / path) != os.readlink(pub_root / path):
+                    copies.append(path)
+                else:
+                    unchanged += 1
+            elif st.st_size != dst.st_size:
+                copies.append(path)
+            elif st.st_mtime_ns == dst.st_mtime_ns:
+                unchanged += 1
+            else:
+                touches.append(path)
+        # 只有 pub 有的: 從最深的開始刪; 上層要刪的目錄底下就不必再一個個刪
+        gone = sorted((rel for rel in dst_entries if rel not in src_entries), key=lambda r: r.count(os.sep))
+        dropped = []
+        for rel in gone:
+            if not any(rel == d or rel.startswith(d + os.sep) for d in dropped):
+                dropped.append(rel)
+        removals += [os.path.normpath(os.path.join(name, rel)) for rel in reversed(dropped)]
+    return copies, removals, touches, unchanged
+
+def _remove(path):
+    # 類型改變時上層目錄可能已經先刪掉了
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def _copy(src, dst):
+    if os.path.islink(src):
+        if os.path.lexists(dst):
+            os.unlink(dst)
+        os.symlink(os.readlink(src), dst)
+    elif os.path.isdir(src):
+        os.makedirs(dst, exist_ok=True)
+        shutil.copystat(src, dst)
+    else:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copy2(src, dst)
+    return 0 if os.path.islink(src) or os.path.isdir(src) else os.lstat(src).st_size
+
+def _touch_or_copy(src, dst):
+    # 大小相同但 mtime 不同: 內容一樣只補 mtime, 不一樣才複製
+    if _digest(src) == _digest(dst):
+        st = os.stat(src)
+        os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+        return False, 0
+    return True, _copy(src, dst)
+
+def sync_labs(dev_root, pub_root, scope=None, on_progress=None, cancel_event=None, workers=READ_WORKERS):
+    # 讓 pub_root/<scope> 與 dev_root/<scope> 相同; on_progress(done, total, path) 在 worker thread 呼叫
+    dev_root, pub_root = pathlib.Path(dev_root), pathlib.Path(pub_root)
+    copies, removals, touches, unchanged = plan_sync(dev_root, pub_root, scope)
+    stats = {"copied": 0, "removed": 0, "touched": 0, "unchanged": unchanged, "bytes": 0, "errors": 0}
+    total = len(copies) + len(removals) + len(touches)
+    done = 0
+    lock = threading.Lock()
+
+    def step(path, counter, size=0):
+        nonlocal done
+        with lock:
+            done += 1
+            if counter:
+                stats[counter] += 1
+            stats["bytes"] += size
+            n = done
+        if on_progress:
+            on_progress(n, total, path)
+
+    def fail(path, e):
+        print(f"[Warning] Failed to sync {pub_root / path}: {e}", file=sys.stderr)
+        with lock:
+            stats["errors"] += 1
+        step(path, None)
+
+    # 刪除與建目錄有先後關係, 依序做; 檔案內容才丟給 thread pool (NFS 上每個檔案都要等來回)
+    for path in removals:
+        if cancel_event is not None and cancel_event.is_set():
+            return stats
+        try:
+            _remove(pub_root / path)
+            step(path, "removed")
+        except OSError as e:
+            fail(path, e)
+    files = []
+    for path in copies:
+        if os.path.isdir(dev_root / path) and not os.path.islink(dev_root / path):
+            try:
+                _copy(dev_root / path, pub_root / path)
+                step(path, "copied")
+            except OSError as e:
+                fail(path, e)
+        else:
+            files.append(path)
+
+    def copy_one(path):
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        try:
+            step(path, "copied", _copy(dev_root / path, pub_root / path))
+        except OSError as e:
+            fail(path, e)
+
+    def touch_one(path):
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        try:
+            copied, size = _touch_or_copy(dev_root / path, pub_root / path)
+            step(path, "copied" if copied else "touched", size)
+        except OSError as e:
+            fail(path, e)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(copy_one, p) for p in files] + [pool.submit(touch_one, p) for p in touches]
+        for f in as_completed(futures):
+            f.result()
+    return stats
+
+def format_sync_stats(stats):
+    mb = stats["bytes"] / (1024 * 1024)
+    line = (f"{stats['copied']} copied ({mb:.1f} MB), {stats['removed']} removed, "
+            f"{stats['touched']} mtime fixed, {stats['unchanged']} unchanged")
+    return line + (f", {stats['errors']} error(s)" if stats["errors"] else "")
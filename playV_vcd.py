@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# 串流讀 VCD 並與 golden 比對, 記憶體只跟 signal 數有關; signal 依完整階層名稱對應
+#    python3 playV_vcd.py golden/golden_wave.vcd sim_result/wave.vcd [-n N]
+import os, re, sys, json, mmap, bisect, hashlib, argparse, pathlib
+
+from playV_core import CACHE_DIR
+
+def parse_header(tokens):
+    # 讀到 $enddefinitions $end 為止, 回傳 (timescale, {id: [name]}, {id: width})
+    timescale, ids, sizes = "", {}, {}
+    scopes = []
+
+    def until_end():
+        words = []
+        for tok in tokens:
+            if tok == "$end":
+                break
+            words.append(tok)
+        return words
+
+    for tok in tokens:
+        if tok == "$scope":
+            words = until_end()
+            scopes.append(words[1] if len(words) > 1 else "")
+        elif tok == "$upscope":
+            until_end()
+            if scopes:
+                scopes.pop()
+        elif tok == "$var":
+            words = until_end()
+            if len(words) < 4:
+                continue
+            _, size, code, ref = words[:4]
+            name = ".".join(scopes + [ref + "".join(words[4:])])
+            ids.setdefault(code, []).append(name)
+            sizes[code] = int(size) if size.isdigit() else 1
+        elif tok == "$timescale":
+            timescale = " ".join(until_end())
+        elif tok == "$enddefinitions":
+            until_end()
+            break
+        elif tok.startswith("$"):
+            until_end()
+    return timescale, ids, sizes
+
+class VCDReader:
+    # 開檔時讀 header, changes() 再串流讀內容
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "r", errors="replace", buffering=1 << 20)
+        self.tokens = self._tokens()
+        self.timescale = ""
+        self.ids = {}       # id code -> [full name, ...]
+        self.sizes = {}     # id code -> bit width
+        self._parse_header()
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _tokens(self):
+        for line in self.f:
+            yield from line.split()
+
+    def _parse_header(self):
+        self.timescale, self.ids, self.sizes = parse_header(self.tokens)
+
+    def changes(self):
+        # 產生 (time, [(id, value), ...]); 第一個 #time 之前的變化算在 time 0
+        time, batch = 0, []
+        tokens = self.tokens
+        for tok in tokens:
+            c = tok[0]
+            if c == "#":
+                if batch:
+                    yield time, batch
+                    batch = []
+                time = int(tok[1:])
+            elif c in "01xXzZ":
+                batch.append((tok[1:], c))
+            elif c in "bBrR":
+                batch.append((next(tokens, ""), tok))
+            elif tok in ("$comment", "$dumpoff"):
+                # $dumpoff 區段內的 x 值不代表真的值, 一起略過
+                for t in tokens:
+                    if t == "$end":
+                        break
+            # $dumpvars / $dumpall / $dumpon / $end 只是包住一般的值變化
+        if batch:
+            yield time, batch
+
+def normalize(value):
+    # 向量值開頭的 0 可省略 (b0011 == b11); x/z 不分大小寫
+    c = value[0]
+    if c in "bB":
+        bits = value[1:].lower().lstrip("0")
+        return bits or "0"
+    if c in "rR":
+        try:
+            return repr(float(value[1:]))
+        except ValueError:
+            return value.lower()
+    return value.lower()
+
+def compare_vcd(golden_path, test_path, max_mismatches=1, signals=None):
+    # 依時間比對兩個檔案都有的 signal, 到 max_mismatches 個不一致就停 (None / 0 為跑完)
+    with VCDReader(golden_path) as gold, VCDReader(test_path) as test:
+        gold_names = {n for names in gold.ids.values() for n in names}
+        test_names = {n for names in test.ids.values() for n in names}
+        common = gold_names & test_names
+        if signals:
+            common = {n for n in common if any(n == s or n.endswith("." + s) for s in signals)}
+        gold_ids = {code: [n for n in names if n in common] for code, names in gold.ids.items()}
+        test_ids = {code: [n for n in names if n in common] for code, names in test.ids.items()}
+        gold_vals, test_vals = {}, {}
+        result = {
+            "mismatches": [],
+            "signals": {},
+            "missing": sorted(gold_names - test_names),
+            "extra": sorted(test_names - gold_names),
+            "timescale": gold.timescale,
+            "end_time": 0,
+            "complete": False,
+        }
+        g_iter, t_iter = gold.changes(), test.changes()
+        g, t = next(g_iter, None), next(t_iter, None)
+        while g or t:
+            now = min(x[0] for x in (g, t) if x)
+            changed = set()
+            if g and g[0] == now:
+                for code, value in g[1]:
+                    for name in gold_ids.get(code, ()):
+                        gold_vals[name] = normalize(value)
+                        changed.add(name)
+                g = next(g_iter, None)
+            if t and t[0] == now:
+                for code, value in t[1]:
+                    for name in test_ids.get(code, ()):
+                        test_vals[name] = normalize(value)
+                        changed.add(name)
+                t = next(t_iter, None)
+            result["end_time"] = now
+            for name in sorted(changed):
+                expected, got = gold_vals.get(name, "x"), test_vals.get(name, "x")
+                if expected == got:
+                    continue
+                stats = result["signals"].setdefault(name, {"count": 0, "first": now})
+                stats["count"] += 1
+                result["mismatches"].append((now, name, expected, got))
+                if max_mismatches and len(result["mismatches"]) >= max_mismatches:
+                    return result
+        result["complete"] = True
+        return result
+
+# sidecar index: 每隔 checkpoint_bytes 記一個 (time, offset, 當下所有值)
+INDEX_DIR = CACHE_DIR / "vcd-index"
+INDEX_VERSION = 2
+MAX_CHECKPOINTS = 256
+MIN_CHECKPOINT_BYTES = 1 << 20
+
+def apply_tokens(words, values):
+    # 把一行 body 的值變化套到 values {id: raw value}, 回傳變動的 id
+    changed = []
+    i = 0
+    while i < len(words):
+        tok = words[i]
+        c = tok[0]
+        if c in "01xXzZ":
+            values[tok[1:]] = c
+            changed.append(tok[1:])
+        elif c in "bBrR" and i + 1 < len(words):
+            i += 1
+            values[words[i]] = tok
+            changed.append(words[i])
+        i += 1
+    return changed
+
+_TOKEN = re.compile(rb"\S+")
+
+def scan_body(f, offset, values, on_time, on_change=None):
+    # 從 offset 往後套用值變化到 values; 每個 #time token 呼叫 on_time(time, token 的 offset), 回傳 True 時停在該 token
+    # 回傳 (停下的 offset 或檔尾, 最後的 time); #time 與值變化可以在同一行 (#15 1!)
+    f.seek(offset)
+    time = None
+    in_comment = False
+    while True:
+        pos = f.tell()
+        line = f.readline()
+        if not line:
+            return pos, time
+        if not in_comment and b"#" not in line and b"$" not in line:
+            changed = apply_tokens(line.decode("latin-1").split(), values)
+            if on_change and changed:
+                on_change(time or 0, changed)
+            continue
+        tokens = _TOKEN.finditer(line)
+        changed = []
+        for m in tokens:
+            tok = m.group()
+            c = tok[:1]
+            if in_comment:
+                in_comment = tok != b"$end"
+            elif c == b"#":
+                if on_change and changed:
+                    on_change(time or 0, changed)
+                    changed = []
+                time = int(tok[1:])
+                if on_time(time, pos + m.start()):
+                    return pos + m.start(), time
+            elif tok in (b"$comment", b"$dumpoff"):
+                in_comment = True
+            elif c in b"01xXzZ":
+                code = tok[1:].decode("latin-1")
+                values[code] = c.decode()
+                changed.append(code)
+            elif c in b"bBrR":
+                nxt = next(tokens, None)
+                if nxt is not None:
+                    code = nxt.group().decode("latin-1")
+                    values[code] = tok.decode("latin-1")
+                    changed.append(code)
+        if on_change and changed:
+            on_change(time or 0, changed)
+
+class VCDIndex:
+    # 一個 VCD 的 checkpoint 索引, 存在 ~/.cache/playV, mtime 或 size 變了就重建
+    def __init__(self, path, data):
+        self.path = pathlib.Path(path)
+        self.timescale = data["timescale"]
+        self.ids = data["ids"]
+        self.header_end = data["header_end"]
+        self.end_time = data["end_time"]
+        self.checkpoints = data["checkpoints"]
+        self.times = [cp[0] for cp in self.checkpoints]
+
+    @staticmethod
+    def sidecar_path(path):
+        key = hashlib.sha1(str(pathlib.Path(path).resolve()).encode()).hexdigest()[:16]
+        return INDEX_DIR / f"{key}.json"
+
+    @classmethod
+    def open(cls, path):
+        st = os.stat(path)
+        side = cls.sidecar_path(path)
+        try:
+            data = json.loads(side.read_text())
+            if (data["version"], data["mtime_ns"], data["size"]) == (INDEX_VERSION, st.st_mtime_ns, st.st_size):
+                return cls(path, data)
+        except (OSError, ValueError, KeyError):
+            pass
+        data = cls.build(path)
+        try:
+            INDEX_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = side.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data))
+            os.replace(tmp, side)
+        except OSError as e:
+            print(f"[Warning] Failed to write VCD index {side}: {e}", file=sys.stderr)
+        return cls(path, data)
+
+    @staticmethod
+    def build(path):
+        st = os.stat(path)
+        step = max(MIN_CHECKPOINT_BYTES, st.st_size // MAX_CHECKPOINTS)
+        with open(path, "rb") as f:
+            header = []
+            for line in iter(f.readline, b""):
+                header.append(line.decode("latin-1"))
+                if b"$enddefinitions" in line:
+                    break
+            timescale, ids, _ = parse_header(tok for l in header for tok in l.split())
+            header_end = f.tell()
+            values, checkpoints = {}, []
+            next_cp = header_end
+
+            def on_time(time, offset):
+                nonlocal next_cp
+                if offset >= next_cp:
+                    checkpoints.append([time, offset, dict(values)])
+                    next_cp = offset + step
+                return False
+
+            _, time = scan_body(f, header_end, values, on_time)
+        return {
+            "version": INDEX_VERSION, "mtime_ns": st.st_mtime_ns, "size": st.st_size,
+            "timescale": timescale, "ids": ids, "header_end": header_end, "end_time": time or 0,
+            "checkpoints": checkpoints,
+        }
+
+    def codes_for(self, name):
+        # 完整名稱或最後幾段, 都可省略 [msb:lsb]
+        exact = [c for c, names in self.ids.items() if any(name in (n, n.split("[")[0]) for n in names)]
+        if exact:
+            return exact
+        return [c for c, names in self.ids.items()
+                if any(n.endswith("." + name) or n.split("[")[0].endswith("." + name) for n in names)]
+
+    def _scan(self, mm, offset, values, until, on_change=None):
+        # 從 offset (某個 #time token) 往後套用變化到 until 為止 (含), 回傳下一個 #time > until 的 offset
+        return scan_body(mm, offset, values, lambda time, _: time > until, on_change)[0]
+
+    def _start(self, time):
+        i = bisect.bisect_right(self.times, time) - 1
+        if i < 0:
+            return self.header_end, {}
+        _, offset, values = self.checkpoints[i]
+        return offset, dict(values)
+
+    def value_at(self, name, time):
+        # 回傳 time 時 (含當下的變化) 的值; 找不到訊號為 None
+        codes = self.codes_for(name)
+        if not codes:
+            return None
+        offset, values = self._start(time)
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            self._scan(mm, offset, values, time)
+        return values.get(codes[0], "x")
+
+    def signal_changes(self, name, t0, t1):
+        # 回傳 [(time, value)]: t0 當下的值, 以及 (t0, t1] 之間的每次變化
+        codes = self.codes_for(name)
+        if not codes:
+            return []
+        code = codes[0]
+        offset, values = self._start(t0)
+        changes = []
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offset = self._scan(mm, offset, values, t0)
+            changes.append((t0, values.get(code, "x")))
+            self._scan(mm, offset, values, t1,
+                       lambda t, changed: code in changed and changes.append((t, values[code])))
+        return changes
+
+    def slice(self, out_path, t0, t1):
+        # 寫出只含 [t0, t1] 的小 VCD: 原本的 header + t0 時的 $dumpvars + 中間原封不動的 body
+        offset, values = self._start(t0)
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            begin = self._scan(mm, offset, values, t0)
+            end = self._scan(mm, begin, dict(values), t1)
+            with open(out_path, "wb") as out:
+                out.write(mm[:self.header_end])
+                dump = [f"#{t0}\n$dumpvars\n"]
+                for code, value in values.items():
+                    dump.append(f"{value} {code}\n" if value[0] in "bBrR" else f"{value}{code}\n")
+                dump.append("$end\n")
+                out.write("".join(dump).encode("latin-1"))
+                out.write(mm[begin:end])
+        return out_path
+
+    def window_around(self, time, checkpoints=2):
+        # 以 checkpoint 為單位, 取 time 前後各幾個 checkpoint 的時間範圍
+        i = bisect.bisect_right(self.times, time) - 1
+        lo = self.times[max(0, i - checkpoints + 1)] if self.times and i >= 0 else 0
+        hi_i = i + checkpoints
+        hi = self.times[hi_i] if 0 <= hi_i < len(self.times) else self.end_time
+        return lo, max(hi, time)
+
+def format_report(result, limit=20):
+    unit = result["timescale"] or "units"
+    lines = []
+    if not result["mismatches"]:
+        scope = "whole dump" if result["complete"] else f"up to #{result['end_time']}"
+        lines.append(f"waveform matches golden ({scope})")
+    else:
+        time, name, expected, got = result["mismatches"][0]
+        lines.append(f"first mismatch at #{time} ({unit}): {name} expected {expected} got {got}")
+        for time, name, expected, got in result["mismatches"][1:limit]:
+            lines.append(f"  #{time}: {name} expected {expected} got {got}")
+        lines.append("per-signal mismatches" + ("" if result["complete"] else " (stopped early)") + ":")
+        for name, stats in sorted(result["signals"].items(), key=lambda kv: kv[1]["first"]):
+            lines.append(f"  {name}: {stats['count']} (first #{stats['first']})")
+    if result["missing"]:
+        lines.append(f"signals missing from your wave: {', '.join(result['missing'][:limit])}")
+    return "\n".join(lines) + "\n"
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compare a VCD against a golden VCD.")
+    ap.add_argument("golden")
+    ap.add_argument("wave")
+    ap.add_argument("-n", "--max-mismatches", type=int, default=1, help="stop after N mismatches (0: read everything)")
+    ap.add_argument("-s", "--signal", action="append", help="only compare this signal (repeatable)")
+    args = ap.parse_args(argv)
+    result = compare_vcd(args.golden, args.wave, args.max_mismatches, args.signal)
+    sys.stdout.write(format_report(result))
+    return 1 if result["mismatches"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
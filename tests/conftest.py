@@ -0,0 +1,16 @@
+import os, sys, pathlib, tempfile
+
+# playV_core 在 import 時決定 CACHE_DIR; history / status cache / VCD index 不要寫到真正的 ~/.cache
+os.environ["XDG_CACHE_HOME"] = tempfile.mkdtemp(prefix="playV-test-cache-")
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from playV_bench import make_labs
+
+@pytest.fixture
+def labs(tmp_path):
+    # 2 個 lab, 各 3 題, 第 3 與第 6 題的 make test 寫 fail
+    root = tmp_path / "labs"
+    make_labs(root, 2, 3, 5, fail_every=3)
+    return root
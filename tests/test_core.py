@@ -0,0 +1,178 @@
+import os, time, threading
+
+import pytest
+
+from playV_core import (
+    SRES_DIR, STOP, NOT_STARTED, Runner, Throttle, discover, iter_problems, schedule_problems, simulate_problem,
+    read_result, _clean_is_simple, clean_is_simple, reset_problem,
+)
+
+def alive(pid):
+    # 被砍掉但還沒被 init 收走的 zombie 不算
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+def run(runner, script, **kw):
+    lines = []
+    rc, killed, why = runner.run(["sh", "-c", script], on_line=lines.append, **kw)
+    return rc, killed, why, lines
+
+def test_runner_returncode_and_lines():
+    rc, killed, _, lines = run(Runner(), "echo a; echo b >&2; exit 3")
+    assert (rc, killed) == (3, None)
+    assert lines == ["a\n", "b\n"]
+
+def test_runner_replaces_invalid_utf8():
+    rc, killed, _, lines = run(Runner(), r"printf 'x\377y\n'")
+    assert (rc, killed) == (0, None)
+    assert lines == ["x�y\n"]
+
+def test_runner_timeout_kills_the_process_group(tmp_path):
+    pid_file = tmp_path / "child.pid"
+    start = time.monotonic()
+    rc, killed, why, _ = run(Runner(timeout=0.5), f"sleep 30 & echo $! > {pid_file}; wait")
+    assert killed == "TIMEOUT"
+    assert time.monotonic() - start < 10
+    time.sleep(0.2)
+    assert not alive(int(pid_file.read_text()))
+
+def test_runner_cancel():
+    runner = Runner()
+    threading.Timer(0.3, runner.cancel).start()
+    rc, killed, _, _ = run(runner, "sleep 30")
+    assert killed == "CANCELLED"
+    # 取消之後的 run 也立刻結束
+    assert run(runner, "sleep 30")[1] == "CANCELLED"
+
+def test_runner_output_limit():
+    rc, killed, why, lines = run(Runner(max_output=1000), "yes playV | head -n 100000; sleep 30")
+    assert killed == "RESOURCE"
+    assert sum(map(len, lines)) <= 1000
+
+def test_runner_stop_from_on_line():
+    runner = Runner()
+    rc, killed, _ = runner.run(["sh", "-c", "echo bad; sleep 30"], on_line=lambda line: STOP)
+    assert killed == "STOPPED"
+
+def test_runner_kills_make_when_on_line_raises(tmp_path):
+    pid_file = tmp_path / "pid"
+
+    def boom(line):
+        raise RuntimeError("reader failed")
+    with pytest.raises(RuntimeError):
+        Runner().run(["sh", "-c", f"echo $$ > {pid_file}; echo go; sleep 30"], on_line=boom)
+    time.sleep(0.2)
+    assert not alive(int(pid_file.read_text()))
+
+def test_throttle_limits_concurrency():
+    throttle = Throttle(2, adaptive=False)
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def job():
+        with throttle.slot():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+    threads = [threading.Thread(target=job) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 2
+    assert throttle.peak == 2 and throttle.waits > 0
+
+def test_throttle_stops_waiting_on_cancel():
+    cancel = threading.Event()
+    throttle = Throttle(1, cancel, adaptive=False)
+    entered = threading.Event()
+
+    def waiter():
+        with throttle.slot():
+            entered.set()
+    with throttle.slot():
+        t = threading.Thread(target=waiter)
+        t.start()
+        assert not entered.wait(0.3)
+        cancel.set()
+        assert entered.wait(5)
+    t.join()
+
+def test_simulate_problem_pass_fail_and_incremental(labs):
+    problems = list(iter_problems(*discover(labs)))
+    assert len(problems) == 6
+    runner = Runner()
+    statuses = {}
+    for lab, prob, dirpath in problems:
+        res = simulate_problem(runner, dirpath, record=False)
+        statuses[(lab, prob)] = res["status"]
+        assert res["output_lines"] == 8 and res["first_output"] is not None
+    assert sorted(statuses.values()) == ["FAIL", "FAIL", "PASS", "PASS", "PASS", "PASS"]
+    _, _, dirpath = problems[0]
+    assert simulate_problem(runner, dirpath, force=False, record=False)["skipped"]
+    (dirpath / "design_src" / "top.v").write_text("module top; endmodule\n")
+    assert not simulate_problem(runner, dirpath, force=False, record=False)["skipped"]
+
+def test_simulate_problem_not_started_after_cancel(labs):
+    runner = Runner()
+    runner.cancel()
+    _, _, dirpath = next(iter_problems(*discover(labs)))
+    res = simulate_problem(runner, dirpath, record=False)
+    assert (res["status"], res["detail"]) == ("CANCELLED", NOT_STARTED)
+
+def _result(dirpath, status, age):
+    (dirpath / SRES_DIR).mkdir(exist_ok=True)
+    (dirpath / SRES_DIR / "result.txt").write_text(status.lower() + "\n")
+    t = time.time() - age
+    os.utime(dirpath / SRES_DIR / "result.txt", (t, t))
+
+def test_schedule_problems(labs):
+    problems = list(iter_problems(*discover(labs)))
+    old = time.time() - 1000
+    for _, _, dirpath in problems:
+        for f in [dirpath / "Makefile", dirpath / "design_src" / "top.v"]:
+            os.utime(f, (old, old))
+        _result(dirpath, "pass", 10)
+    (a, b, c, d, e, f) = problems
+    _result(b[2], "fail", 10)
+    # e 在上次跑完之後改過
+    os.utime(e[2] / "design_src" / "top.v")
+    durations = {(x[0], x[1]): i for i, x in enumerate(problems)}
+    assert schedule_problems(problems, durations, parallel=True, policy="smart") == [e, b, f, d, c, a]
+    assert schedule_problems(problems, durations, parallel=True, policy="alpha") == problems
+
+@pytest.mark.parametrize("makefile, simple", [
+    ("clean:\n\trm -rf sim_result\n", True),
+    ("clean:\n\t@rm -rf ./sim_result/*\n", True),
+    ("test:\n\tmake sim\n", True),
+    ("clean:\n\trm -rf sim_result/../*\n", False),
+    ("clean:\n\trm -rf sim_result build\n", False),
+    ("clean: tidy\n\trm -rf sim_result\n", False),
+    ("test clean:\n\trm -rf sim_result\n", False),
+    ("clean::\n\trm -rf sim_result\n", False),
+    ("clean:\n\trm -rf sim_result; rm -f a.out\n", False),
+    ("include common.mk\nclean:\n\trm -rf sim_result\n", False),
+    ("clean:\n\trm -rf sim_result\nclean:\n\trm -f a.out\n", False),
+])
+def test_clean_is_simple(makefile, simple):
+    assert _clean_is_simple(makefile) is simple
+
+def test_clean_is_simple_uses_the_makefile_make_picks(tmp_path):
+    assert clean_is_simple(tmp_path)
+    (tmp_path / "makefile").write_text("clean:\n\trm -rf sim_result obj\n")
+    assert not clean_is_simple(tmp_path)
+    (tmp_path / "GNUmakefile").write_text("clean:\n\trm -rf sim_result\n")
+    assert clean_is_simple(tmp_path)
+
+def test_reset_problem_fast_path(labs):
+    runner = Runner()
+    _, _, dirpath = next(iter_problems(*discover(labs)))
+    simulate_problem(runner, dirpath, record=False)
+    assert read_result(dirpath) == "PASS"
+    assert reset_problem(runner, dirpath) == ("NULL", None, False)
+    assert not (dirpath / SRES_DIR).exists()
@@ -0,0 +1,72 @@
+import time, threading
+
+import pytest
+
+import playV_dist
+from playV_core import discover, iter_problems, read_result
+from playV_dist import Coordinator, DistManager
+
+@pytest.fixture
+def coordinator():
+    c = Coordinator(("127.0.0.1", 0), b"test-key")
+    yield c
+    c.close()
+
+def steal_jobs(c, n):
+    # 拿走 n 個工作就斷線, 像是 worker 在回報 start 之前就掛了
+    m = DistManager(address=("127.0.0.1", c.address[1]), authkey=b"test-key")
+    m.connect()
+    q = m.jobs()
+    return [q.get(timeout=10) for _ in range(n)]
+
+def run_in_thread(c, problems):
+    results = []
+    t = threading.Thread(target=lambda: results.extend(c.run(problems)), daemon=True)
+    t.start()
+    return t, results
+
+def test_local_workers_run_everything(labs):
+    problems = list(iter_problems(*discover(labs)))
+    c = Coordinator(("127.0.0.1", 0), b"test-key", local_workers=2)
+    try:
+        results = list(c.run(problems))
+    finally:
+        c.close()
+    assert sorted(r[2]["status"] for r in results) == ["FAIL", "FAIL", "PASS", "PASS", "PASS", "PASS"]
+    assert all(r[2]["worker"] for r in results)
+    for lab, prob, dirpath in problems:
+        assert read_result(dirpath) in ("PASS", "FAIL")
+
+def test_jobs_lost_before_start_are_requeued(labs, coordinator, monkeypatch):
+    monkeypatch.setattr(playV_dist, "DIST_STALE", 1)
+    problems = list(iter_problems(*discover(labs)))[:3]
+    t, results = run_in_thread(coordinator, problems)
+    steal_jobs(coordinator, 2)
+    coordinator.spawn_local()
+    t.join(60)
+    assert not t.is_alive()
+    assert sorted(r[2]["status"] for r in results) == ["FAIL", "PASS", "PASS"]
+
+def test_cancel_resolves_lost_jobs(labs, coordinator):
+    problems = list(iter_problems(*discover(labs)))
+    t, results = run_in_thread(coordinator, problems)
+    steal_jobs(coordinator, 2)
+    time.sleep(0.5)
+    coordinator.cancel()
+    t.join(10)
+    assert not t.is_alive()
+    assert len(results) == len(problems)
+    assert {r[2]["status"] for r in results} == {"CANCELLED"}
+
+def test_outside_inputs_stay_on_the_coordinator(tmp_path, coordinator):
+    common = tmp_path / "labs" / "common"
+    common.mkdir(parents=True)
+    (common / "tb.txt").write_text("v1\n")
+    dirpath = tmp_path / "labs" / "lab1" / "p1"
+    dirpath.mkdir(parents=True)
+    (dirpath / "Makefile").write_text("test:\n\t@mkdir -p sim_result\n"
+                                      "\t@grep -q v1 ../../common/tb.txt && echo pass > sim_result/result.txt\n")
+    # worker 都沒有, 還是跑得完
+    [(lab, prob, res, out)] = list(coordinator.run([("lab1", "p1", dirpath)]))
+    assert res["status"] == "PASS"
+    assert "not sent to a worker" in res["in_place"]
@@ -0,0 +1,39 @@
+from playV_core import SRES_DIR, Runner, discover, iter_problems, simulate_problem, outside_inputs, read_result
+from playV_scratch import Scratch
+
+def first_problem(labs):
+    return next(iter_problems(*discover(labs)))[2]
+
+def test_scratch_run_copies_only_sim_result_back(labs, tmp_path):
+    scratch = Scratch(tmp_path / "scratch")
+    dirpath = first_problem(labs)
+    res = simulate_problem(Runner(), dirpath, record=False, scratch=scratch)
+    assert res["status"] == "PASS" and res["in_place"] is None
+    assert read_result(dirpath) == "PASS"
+    assert (scratch.path_for(dirpath) / "Makefile").is_file()
+
+def test_scratch_does_not_report_a_stale_result(labs, tmp_path):
+    scratch = Scratch(tmp_path / "scratch")
+    dirpath = first_problem(labs)
+    simulate_problem(Runner(), dirpath, record=False, scratch=scratch)
+    # make clean 之後 make test 不再寫 result.txt: scratch 裡上次的 pass 不能被當成這次的結果
+    (dirpath / "Makefile").write_text("test:\n\t@echo no result\n")
+    (dirpath / SRES_DIR / "result.txt").unlink()
+    res = simulate_problem(Runner(), dirpath, record=False, scratch=scratch)
+    assert res["status"] == "FAIL"
+
+def test_outside_inputs_run_in_place(tmp_path):
+    common = tmp_path / "labs" / "common"
+    common.mkdir(parents=True)
+    (common / "tb.txt").write_text("v1\n")
+    dirpath = tmp_path / "labs" / "lab1" / "p1"
+    dirpath.mkdir(parents=True)
+    (dirpath / "Makefile").write_text("TB = ../../common/tb.txt\ntest:\n\t@mkdir -p sim_result\n"
+                                      "\t@grep -q v1 $(TB) && echo pass > sim_result/result.txt\n")
+    assert outside_inputs(dirpath) == [common / "tb.txt"]
+    res = simulate_problem(Runner(), dirpath, record=False, scratch=Scratch(tmp_path / "scratch"))
+    assert res["status"] == "PASS"
+    assert "../../common/tb.txt" in res["in_place"]
+
+def test_no_outside_inputs(labs):
+    assert outside_inputs(first_problem(labs)) == []
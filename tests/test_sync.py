@@ -0,0 +1,39 @@
+import os
+
+from playV_sync import plan_sync, sync_labs
+
+def tree(root, files):
+    for rel, text in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+def test_plan_sync(tmp_path):
+    dev, pub = tmp_path / "dev", tmp_path / "pub"
+    tree(dev, {"lab1/p1/design_src/top.v": "dev", "lab1/p1/Makefile": "test:", "lab1/p2/design_src/top.v": "same",
+               "lab2/p1/design_src/top.v": "new"})
+    tree(pub, {"lab1/p1/design_src/top.v": "student", "lab1/p1/Makefile": "test:", "lab1/p2/design_src/top.v": "same",
+               "lab1/p1/design_src/extra.v": "x", "lab1/old/design_src/a.v": "x"})
+    for rel in ("lab1/p1/Makefile", "lab1/p2/design_src/top.v"):
+        st = os.stat(dev / rel)
+        os.utime(pub / rel, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.utime(pub / "lab1/p2/design_src/top.v", (0, 0))
+    copies, removals, touches, unchanged = plan_sync(dev, pub)
+    assert "lab1/p1/design_src/top.v" in copies
+    assert "lab2/p1/design_src/top.v" in copies and "lab2" in copies
+    assert "lab1/p1/Makefile" not in copies
+    # 只有 pub 有的目錄整個刪, 底下的檔案不再個別列出
+    assert sorted(removals) == ["lab1/old", "lab1/p1/design_src/extra.v"]
+    assert touches == ["lab1/p2/design_src/top.v"]
+    assert unchanged > 0
+    assert plan_sync(dev, pub, "lab1/p2")[:3] == ([], [], ["lab1/p2/design_src/top.v"])
+
+def test_sync_labs_makes_the_trees_equal(tmp_path):
+    dev, pub = tmp_path / "dev", tmp_path / "pub"
+    tree(dev, {"lab1/p1/design_src/top.v": "dev", "lab1/p2/design_src/top.v": "same"})
+    tree(pub, {"lab1/p1/design_src/top.v": "student edit", "lab1/p2/design_src/top.v": "same", "lab1/junk/a": "x"})
+    stats = sync_labs(dev, pub)
+    assert stats["errors"] == 0 and stats["removed"] == 1
+    assert (pub / "lab1/p1/design_src/top.v").read_text() == "dev"
+    assert not (pub / "lab1/junk").exists()
+    assert plan_sync(dev, pub)[:3] == ([], [], [])
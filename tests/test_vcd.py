@@ -0,0 +1,66 @@
+import pytest
+
+import playV_vcd
+from playV_vcd import VCDIndex, compare_vcd
+
+HEADER = """$timescale 1ns $end
+$scope module tb $end
+$var wire 1 ! clk $end
+$var wire 4 # data [3:0] $end
+$upscope $end
+$enddefinitions $end
+"""
+
+def write(path, body):
+    path.write_text(HEADER + body)
+    return path
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(playV_vcd, "INDEX_DIR", tmp_path / "index")
+    monkeypatch.setattr(playV_vcd, "MIN_CHECKPOINT_BYTES", 64)
+
+def dump(times, same_line):
+    # 每個時間 clk 翻轉, data = t % 16; same_line 時 #time 與值變化寫在同一行
+    out = ["$dumpvars 0! b0 # $end\n"]
+    for t in times:
+        changes = f"{t % 2}! b{t % 16:b} #"
+        out.append(f"#{t} {changes}\n" if same_line else f"#{t}\n{changes.replace(' b', chr(10) + 'b')}\n")
+    return "".join(out)
+
+def test_compare_vcd_match_and_first_mismatch(tmp_path):
+    golden = write(tmp_path / "golden.vcd", dump(range(1, 50), False))
+    same = write(tmp_path / "same.vcd", dump(range(1, 50), True))
+    result = compare_vcd(golden, same, 0)
+    assert result["complete"] and not result["mismatches"]
+    wrong = write(tmp_path / "wrong.vcd", dump(range(1, 50), True).replace("#7 1! b111 #", "#7 0! b111 #"))
+    result = compare_vcd(golden, wrong, 1)
+    assert result["mismatches"] == [(7, "tb.clk", "1", "0")]
+    assert not result["complete"]
+
+@pytest.mark.parametrize("same_line", [False, True])
+def test_vcd_index_values(tmp_path, same_line):
+    path = write(tmp_path / "wave.vcd", dump(range(1, 400), same_line))
+    idx = VCDIndex.open(path)
+    assert len(idx.checkpoints) > 10
+    assert idx.end_time == 399
+    for t in (0, 1, 57, 200, 399, 1000):
+        last = min(t, 399)
+        assert idx.value_at("clk", t) == str(last % 2)
+        assert idx.value_at("tb.data", t) == (f"b{last % 16:b}" if last else "b0")
+    assert idx.value_at("nope", 5) is None
+    assert idx.signal_changes("clk", 100, 103) == [(100, "0"), (101, "1"), (102, "0"), (103, "1")]
+
+def test_vcd_index_rebuilds_after_change(tmp_path):
+    path = write(tmp_path / "wave.vcd", dump(range(1, 10), True))
+    assert VCDIndex.open(path).end_time == 9
+    write(path, dump(range(1, 20), True))
+    assert VCDIndex.open(path).end_time == 19
+
+def test_vcd_index_slice_matches_original(tmp_path):
+    path = write(tmp_path / "wave.vcd", "$comment #5 is not a time $end\n" + dump(range(1, 400), True))
+    idx = VCDIndex.open(path)
+    out = idx.slice(tmp_path / "slice.vcd", 150, 250)
+    result = compare_vcd(path, out, 0)
+    assert not [m for m in result["mismatches"] if 150 <= m[0] <= 250]
+    assert out.stat().st_size < path.stat().st_size